@@ -0,0 +1,426 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Async Database Adapter - awaitable version of the db_adapter API
+Uses asyncpg (PostgreSQL) or aiosqlite (SQLite) with an async connection pool,
+falls back to running the db_adapter functions in a thread pool if the driver is missing
+"""
+
+import os
+import time
+import sqlite3
+import asyncio
+import logging
+import functools
+from datetime import datetime
+from typing import Optional, Dict, List
+from urllib.parse import urlparse, urlunparse, parse_qs, urlencode
+
+import pytz
+
+import db_adapter
+from db_adapter import USE_POSTGRES, PGBOUNCER_PORT
+from number_progress import NumberProgress
+from queries import statements_for
+
+logger = logging.getLogger(__name__)
+
+BANGLADESH_TZ = pytz.timezone('Asia/Dhaka')
+ASYNC_DB_POOL_SIZE = int(os.getenv("ASYNC_DB_POOL_SIZE", "10"))  # Max connections in the async pool
+
+# Pick the backend: native async driver if installed, else db_adapter in a thread pool
+if USE_POSTGRES:
+    try:
+        import asyncpg
+        BACKEND = 'asyncpg'
+    except ImportError:
+        BACKEND = 'thread'
+else:
+    try:
+        import aiosqlite
+        BACKEND = 'aiosqlite'
+    except ImportError:
+        BACKEND = 'thread'
+
+logger.info(f"Async database backend: {BACKEND}")
+
+_pool = None
+_pool_lock = None
+_executor = None  # Thread pool for the 'thread' backend (None = loop default)
+
+def set_executor(executor):
+    """Use this executor for the thread fallback"""
+    global _executor
+    _executor = executor
+
+async def run_in_thread(func, *args):
+    """Run a blocking db_adapter function off the event loop"""
+    return await asyncio.get_running_loop().run_in_executor(_executor, func, *args)
+
+def _native_or_thread(sync_func):
+    """Use the decorated coroutine with a native driver, else run sync_func in a thread"""
+    def decorator(func):
+        if BACKEND != 'thread':
+            return func
+        
+        @functools.wraps(func)
+        async def fallback(*args):
+            return await run_in_thread(sync_func, *args)
+        return fallback
+    return decorator
+
+# ==================== POOLS ====================
+
+def _asyncpg_dsn() -> str:
+    """db_adapter's DATABASE_URL without libpq-only options asyncpg would send as server settings"""
+    parsed = urlparse(db_adapter.DATABASE_URL)
+    query_params = parse_qs(parsed.query)
+    query_params.pop('connect_timeout', None)
+    return urlunparse(parsed._replace(query=urlencode(query_params, doseq=True)))
+
+class SQLitePool:
+    """Fixed set of aiosqlite connections handed out through a queue"""
+    
+    def __init__(self, size: int):
+        self.size = size
+        self._idle = asyncio.Queue()
+        self._opened = 0
+        self._connections = set()  # Every open connection, idle or checked out
+    
+    async def _open(self):
+        conn = await aiosqlite.connect(db_adapter.DB_PATH, timeout=db_adapter.SQLITE_BUSY_TIMEOUT,
+                                       cached_statements=db_adapter.SQLITE_CACHED_STATEMENTS)
+        conn.row_factory = sqlite3.Row  # Column names without a cursor (execute_fetchall)
+        await conn.execute('PRAGMA journal_mode=WAL')
+        await conn.execute('PRAGMA synchronous=NORMAL')
+        await conn.execute(f'PRAGMA busy_timeout={db_adapter.SQLITE_BUSY_TIMEOUT * 1000}')
+        self._connections.add(conn)
+        return conn
+    
+    async def acquire(self):
+        if self._idle.empty() and self._opened < self.size:
+            self._opened += 1
+            try:
+                return await self._open()
+            except Exception:
+                self._opened -= 1
+                raise
+        return await self._idle.get()
+    
+    async def release(self, conn):
+        if conn not in self._connections:
+            return  # Closed by close() while checked out
+        if conn.in_transaction:
+            await conn.rollback()
+        self._idle.put_nowait(conn)
+    
+    async def close(self):
+        """Close every connection, including ones still checked out"""
+        connections, self._connections = self._connections, set()
+        while not self._idle.empty():
+            self._idle.get_nowait()
+        for conn in connections:
+            try:
+                await conn.close()
+            except Exception as e:
+                logger.warning(f"Error closing SQLite connection: {e}")
+        self._opened = 0
+
+async def get_pool():
+    """Create the async pool on first use (inside the running event loop)"""
+    global _pool, _pool_lock
+    if _pool is not None:
+        return _pool
+    if _pool_lock is None:
+        _pool_lock = asyncio.Lock()
+    
+    async with _pool_lock:
+        if _pool is None:
+            if BACKEND == 'asyncpg':
+                # Transaction-mode pgbouncer cannot keep prepared statements across transactions
+                pooler = urlparse(db_adapter.DATABASE_URL).port == PGBOUNCER_PORT
+                _pool = await asyncpg.create_pool(
+                    _asyncpg_dsn(),
+                    min_size=1,
+                    max_size=ASYNC_DB_POOL_SIZE,
+                    statement_cache_size=0 if pooler else 100,
+                    timeout=10
+                )
+                logger.info(f"asyncpg pool ready (max {ASYNC_DB_POOL_SIZE}, statement cache {'off' if pooler else 'on'})")
+            else:
+                _pool = SQLitePool(ASYNC_DB_POOL_SIZE)
+    return _pool
+
+async def close_pool():
+    """Close the async pool (call on shutdown)"""
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+async def execute_query(query, params=(), fetch=None, raise_errors=False):
+    """Execute a query on the async pool (statements from SQL, already in the driver's paramstyle)"""
+    started = time.perf_counter()
+    try:
+        return await _execute_query(query, params, fetch, raise_errors)
+    finally:
+        db_adapter._record_statement(_statement_names.get(query, 'other'), time.perf_counter() - started)
+
+async def _execute_query(query, params, fetch, raise_errors):
+    """execute_query without the latency bookkeeping"""
+    pool = await get_pool()
+    
+    if BACKEND == 'asyncpg':
+        try:
+            async with pool.acquire() as conn:
+                if fetch == 'one':
+                    row = await conn.fetchrow(query, *params)
+                    return tuple(row) if row else None
+                elif fetch == 'all':
+                    return [tuple(row) for row in await conn.fetch(query, *params)]
+                elif fetch == 'dict':
+                    row = await conn.fetchrow(query, *params)
+                    return dict(row) if row else None
+                await conn.execute(query, *params)
+                return None
+        except Exception as e:
+            logger.error(f"Database error: {e}")
+            if raise_errors:
+                raise
+            return None if fetch else False
+    
+    # Every aiosqlite call is a hop to the connection's thread - keep them to one per read, two per write
+    conn = await pool.acquire()
+    try:
+        if not fetch:
+            await conn.execute(query, params)
+            await conn.commit()
+            return None
+        
+        rows = await conn.execute_fetchall(query, params)
+        if conn.in_transaction:
+            await conn.commit()  # Write that also returns rows
+        
+        if fetch == 'one':
+            return tuple(rows[0]) if rows else None
+        elif fetch == 'all':
+            return [tuple(row) for row in rows]
+        elif fetch == 'dict':
+            return dict(zip(rows[0].keys(), rows[0])) if rows else None
+        return None
+    except Exception as e:
+        await conn.rollback()
+        logger.error(f"Database error: {e}")
+        if raise_errors:
+            raise
+        return None if fetch else False
+    finally:
+        await pool.release(conn)
+
+# ==================== DATABASE FUNCTIONS ====================
+
+# Statements for the native driver (the thread fallback uses db_adapter.SQL)
+SQL = statements_for('asyncpg' if USE_POSTGRES else 'sqlite')
+_statement_names = {query: name for name, query in SQL.items()}
+
+async def init_db():
+    """Initialize database (schema setup stays synchronous)"""
+    await run_in_thread(db_adapter.init_db)
+
+@_native_or_thread(db_adapter._load_user)
+async def _load_user(user_id: int):
+    """Read a user row from the database (None = no such user, UserCache.MISS = query failed)"""
+    try:
+        return await execute_query(SQL['get_user'], (user_id,), fetch='dict', raise_errors=True)
+    except Exception:
+        return db_adapter.UserCache.MISS  # Already logged by execute_query
+
+async def get_user(user_id: int) -> Optional[Dict]:
+    """Get user - a cache hit is answered without a database call or thread hop"""
+    cache = db_adapter.user_cache
+    cached = cache.get(user_id)
+    if cached is not db_adapter.UserCache.MISS:
+        return cached
+    generation = cache.generation
+    user = await _load_user(user_id)
+    if user is db_adapter.UserCache.MISS:
+        return None
+    cache.put(user_id, user, generation)
+    return user
+
+@_native_or_thread(db_adapter.add_or_update_user)
+async def add_or_update_user(user_id: int, username: str, first_name: str, last_name: str):
+    """Add or update user (keeps approval, balance and totals of existing users)"""
+    await execute_query(SQL['add_or_update_user'], (user_id, username, first_name, last_name))
+    db_adapter.user_cache.invalidate(user_id)
+
+@_native_or_thread(db_adapter.approve_user)
+async def approve_user(user_id: int):
+    """Approve user"""
+    await execute_query(SQL['set_user_approved'], (1, user_id))
+    db_adapter.user_cache.invalidate(user_id)
+
+@_native_or_thread(db_adapter.reject_user)
+async def reject_user(user_id: int):
+    """Reject user"""
+    await execute_query(SQL['set_user_approved'], (-1, user_id))
+    db_adapter.user_cache.invalidate(user_id)
+
+@_native_or_thread(db_adapter.update_user_stats)
+async def update_user_stats(user_id: int, numbers_added: int = 0, earnings: float = 0):
+    """Update user statistics"""
+    today = datetime.now(BANGLADESH_TZ).strftime('%Y-%m-%d')
+    await execute_query(SQL['add_user_stats'], (numbers_added, numbers_added, earnings, user_id))
+    await execute_query(SQL['add_daily_stats'], (user_id, today, numbers_added, earnings))
+    db_adapter.user_cache.invalidate(user_id)
+
+@_native_or_thread(db_adapter.reset_daily_stats)
+async def reset_daily_stats():
+    """Reset daily statistics"""
+    await execute_query(SQL['reset_daily_numbers'])
+    await execute_query(SQL['delete_incomplete_progress'])
+    db_adapter.user_cache.clear()
+    logger.info("Daily stats reset completed")
+
+@_native_or_thread(db_adapter.get_daily_report)
+async def get_daily_report() -> List[Dict]:
+    """Get daily report (every approved user, most numbers first)"""
+    today = datetime.now(BANGLADESH_TZ).strftime('%Y-%m-%d')
+    rows = await execute_query(SQL['daily_report'], (today,), fetch='all')
+    columns = ['user_id', 'first_name', 'username', 'numbers_added', 'earnings']
+    return [dict(zip(columns, row)) for row in rows] if rows else []
+
+@_native_or_thread(db_adapter.get_admin_totals)
+async def get_admin_totals() -> Dict:
+    """Admin panel counters (summary row if enabled, else one aggregate over users)"""
+    row = await execute_query(SQL['admin_summary'], fetch='dict') if db_adapter.ADMIN_SUMMARY else None
+    if row is None:
+        row = await execute_query(SQL['admin_totals'], fetch='dict')
+    return db_adapter._admin_totals(row)
+
+async def log_activity(user_id: int, action: str, details: str = ""):
+    """Log user activity (buffered in memory, written in batches by db_adapter.activity_log_buffer)"""
+    if db_adapter.activity_log_buffer.append(user_id, action, details):
+        # Writer is behind - wait for the backlog to be written (off the event loop) before continuing
+        await run_in_thread(db_adapter.activity_log_buffer.apply_backpressure)
+
+async def _sqlite_write_and_read_progress(query: str, params: tuple, phone: str) -> Optional[NumberProgress]:
+    """Run one write on number_progress and read the row back on the same connection/transaction"""
+    pool = await get_pool()
+    conn = await pool.acquire()
+    try:
+        await conn.execute(query, params)
+        cursor = await conn.execute(SQL['get_number_progress'], (phone,))
+        row = await cursor.fetchone()
+        columns = [desc[0] for desc in cursor.description]
+        await conn.commit()
+        return NumberProgress.from_row(dict(zip(columns, row)) if row else None)
+    except Exception as e:
+        await conn.rollback()
+        logger.error(f"Database error: {e}")
+        return None
+    finally:
+        await pool.release(conn)
+
+@_native_or_thread(db_adapter.get_number_progress)
+async def get_number_progress(phone: str) -> Optional[NumberProgress]:
+    """Get progress for a phone number"""
+    return NumberProgress.from_row(await execute_query(SQL['get_number_progress'], (phone,), fetch='dict'))
+
+@_native_or_thread(db_adapter.init_number_progress)
+async def init_number_progress(phone: str, user_id: int):
+    """Initialize progress tracking"""
+    await execute_query(SQL['init_number_progress'], (phone, user_id))
+
+@_native_or_thread(db_adapter.ensure_number_progress)
+async def ensure_number_progress(phone: str, user_id: int) -> Optional[NumberProgress]:
+    """Create the progress row if missing and return the current progress (one round trip)"""
+    if USE_POSTGRES:
+        return NumberProgress.from_row(await execute_query(SQL['ensure_number_progress'], (phone, user_id), fetch='dict'))
+    return await _sqlite_write_and_read_progress(SQL['ensure_number_progress'], (phone, user_id), phone)
+
+@_native_or_thread(db_adapter.update_site_progress)
+async def update_site_progress(phone: str, site_index: int, linked: bool = True) -> Optional[NumberProgress]:
+    """Set or clear one site's bit and return the new progress"""
+    query = SQL['link_site'] if linked else SQL['unlink_site']
+    params = (NumberProgress.site_bit(site_index), phone)
+    if USE_POSTGRES:
+        return NumberProgress.from_row(await execute_query(query, params, fetch='dict'))
+    return await _sqlite_write_and_read_progress(query, params, phone)
+
+@_native_or_thread(db_adapter.check_and_complete_number)
+async def check_and_complete_number(phone: str):
+    """Check if all sites linked"""
+    full = NumberProgress.full_mask()
+    row = await execute_query(SQL['get_linked_mask'], (phone,), fetch='one')
+    if row and ((row[0] or 0) & full) == full:
+        await execute_query(SQL['mark_number_completed'], (phone,))
+        return True
+    return False
+
+@_native_or_thread(db_adapter.complete_number_and_credit)
+async def complete_number_and_credit(phone: str, user_id: int, amount: float) -> Optional[Dict]:
+    """Mark a fully linked number completed and pay the user, in one transaction (None if not credited)"""
+    today = datetime.now(BANGLADESH_TZ).strftime('%Y-%m-%d')
+    full = NumberProgress.full_mask()
+    
+    if BACKEND == 'asyncpg':
+        row = await execute_query(SQL['complete_number_and_credit'],
+                                  (phone, full, full, amount, user_id, user_id, today, amount), fetch='dict')
+        if row:
+            db_adapter.user_cache.invalidate(user_id)
+        return row
+    
+    pool = await get_pool()
+    conn = await pool.acquire()
+    try:
+        await conn.execute('BEGIN IMMEDIATE')
+        cursor = await conn.execute(SQL['complete_number'], (phone, full, full))
+        if cursor.rowcount == 0:
+            await conn.rollback()
+            return None
+        
+        await conn.execute(SQL['add_user_stats'], (1, 1, amount, user_id))
+        await conn.execute(SQL['add_daily_stats'], (user_id, today, 1, amount))
+        cursor = await conn.execute(SQL['get_user_totals'], (user_id,))
+        row = await cursor.fetchone()
+        await conn.commit()
+        db_adapter.user_cache.invalidate(user_id)
+        if row:
+            return {'balance': row[0], 'total_numbers': row[1], 'daily_numbers': row[2]}
+        return None
+    except Exception as e:
+        await conn.rollback()
+        logger.error(f"Database error: {e}")
+        return None
+    finally:
+        await pool.release(conn)
+
+@_native_or_thread(db_adapter.get_incomplete_sites)
+async def get_incomplete_sites(phone: str) -> list:
+    """Get incomplete sites"""
+    progress = await get_number_progress(phone)
+    if not progress:
+        return list(range(1, NumberProgress.site_count + 1))
+    return progress.incomplete_sites()
+
+@_native_or_thread(db_adapter.reset_daily_number_progress)
+async def reset_daily_number_progress():
+    """Reset incomplete progress"""
+    await execute_query(SQL['delete_incomplete_progress'])
+    logger.info("Reset incomplete number progress")
+
+@_native_or_thread(db_adapter.save_session)
+async def save_session(site_key: str, token: str, cookie: str = ''):
+    """Store the current session token (and Cloudflare cookie) of a site"""
+    await execute_query(SQL['save_session'], (site_key, token, cookie))
+
+@_native_or_thread(db_adapter.load_sessions)
+async def load_sessions() -> Dict[str, Dict]:
+    """Get stored session tokens and cookies by site_key (created_at as epoch seconds)"""
+    rows = await execute_query(SQL['load_sessions'], fetch='all')
+    return {
+        site_key: {'token': token, 'cookie': cookie or '', 'created_at': float(created_at or 0)}
+        for site_key, token, cookie, created_at in rows or []
+        if token
+    }
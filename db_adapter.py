@@ -6,9 +6,17 @@ This allows telegram_bot.py to work unchanged in both local and production
 """
 
 import os
+import atexit
+import time
 import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
 from typing import Optional, Dict, List
 
+from number_progress import NumberProgress
+from queries import statements_for, count_params
+
 logger = logging.getLogger(__name__)
 
 # Check if we should use PostgreSQL
@@ -36,13 +44,52 @@ if DATABASE_URL and '@' in DATABASE_URL:
         logger.warning(f"Could not fix DATABASE_URL encoding: {e}")
 
 USE_POSTGRES = bool(DATABASE_URL)
+PGBOUNCER_PORT = 6543  # Supabase transaction pooler - no server-side prepared statements
+# Server-side prepared statements for the hot queries: on / off / auto (on unless connected through the pooler)
+PG_PREPARE = os.getenv("PG_PREPARE", "auto").lower()
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))  # PostgreSQL connections opened at startup
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "20"))  # PostgreSQL connections at most; callers wait beyond this
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))  # Seconds to wait for a free connection before failing
+DB_POOL_RECYCLE = float(os.getenv("DB_POOL_RECYCLE", "1800"))  # Reconnect connections older than this (seconds)
+DB_POOL_PING_AFTER = float(os.getenv("DB_POOL_PING_AFTER", "30"))  # Ping connections idle longer than this before use
+
+class PoolTimeout(Exception):
+    """No database connection became free within DB_POOL_TIMEOUT"""
+
+# Per-statement latency (statement name -> [calls, total seconds, max seconds])
+statement_stats = {}
+_statement_stats_lock = threading.Lock()
+
+def _record_statement(name: str, seconds: float):
+    """Add one execution to statement_stats"""
+    with _statement_stats_lock:
+        entry = statement_stats.get(name)
+        if entry is None:
+            statement_stats[name] = [1, seconds, seconds]
+        else:
+            entry[0] += 1
+            entry[1] += seconds
+            if seconds > entry[2]:
+                entry[2] = seconds
+
+def get_statement_stats() -> List[Dict]:
+    """Per-statement calls / avg / max latency (ms), most total time first"""
+    with _statement_stats_lock:
+        items = [(name, *entry) for name, entry in statement_stats.items()]
+    return [
+        {'name': name, 'calls': calls, 'avg_ms': total / calls * 1000, 'max_ms': worst * 1000}
+        for name, calls, total, worst in sorted(items, key=lambda item: item[2], reverse=True)
+    ]
 
 # Initialize based on database type
 if USE_POSTGRES:
     try:
         import psycopg2
-        from psycopg2.extras import RealDictCursor
-        from psycopg2 import pool as pg_pool
+        from psycopg2.extras import RealDictCursor, execute_values
+        from psycopg2 import errors as pg_errors
+        from psycopg2.extensions import connection as pg_connection
+        from psycopg2.extensions import TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_UNKNOWN
+        from urllib.parse import urlparse
         import pytz
         from datetime import datetime
         
@@ -73,42 +120,213 @@ if USE_POSTGRES:
         except Exception as e:
             logger.warning(f"Could not modify DATABASE_URL: {e}")
         
+        class PreparingConnection(pg_connection):
+            """psycopg2 connection that remembers which statements it has PREPAREd, and its age"""
+            
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                self.prepared = set()
+                self.opened_at = time.monotonic()
+                self.last_used = self.opened_at
+        
+        class BlockingConnectionPool:
+            """Thread-safe pool that keeps connections open between uses, waits for a free
+            connection instead of raising, and replaces old or dead connections before handing them out"""
+            
+            def __init__(self, minconn: int, maxconn: int, timeout: float, recycle: float, ping_after: float,
+                         **connect_kwargs):
+                self.maxconn = maxconn
+                self.timeout = timeout
+                self.recycle = recycle
+                self.ping_after = ping_after
+                self._connect_kwargs = connect_kwargs
+                self._idle = []  # LIFO - the most recently used connection is the warmest
+                self._opened = 0
+                self._slots = threading.BoundedSemaphore(maxconn)  # One per connection a caller may hold
+                self._lock = threading.Lock()
+                self._closed = False  # After closeall(), returned connections are closed instead of kept
+                self.stats = {'checkouts': 0, 'waited': 0, 'wait_seconds': 0.0, 'max_wait_seconds': 0.0,
+                              'timeouts': 0, 'recycled': 0, 'dead': 0}
+                for _ in range(minconn):
+                    self._idle.append(self._connect())
+            
+            def _connect(self):
+                conn = psycopg2.connect(**self._connect_kwargs)
+                with self._lock:
+                    self._opened += 1
+                return conn
+            
+            def _discard(self, conn, reason: Optional[str] = None):
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+                with self._lock:
+                    self._opened -= 1
+                    if reason:
+                        self.stats[reason] += 1
+            
+            def getconn(self):
+                """Borrow a healthy connection, waiting up to timeout for one to be returned"""
+                started = time.monotonic()
+                if not self._slots.acquire(timeout=self.timeout):
+                    with self._lock:
+                        self.stats['timeouts'] += 1
+                    raise PoolTimeout(f"no PostgreSQL connection free after {self.timeout:.0f}s "
+                                      f"({self.maxconn}/{self.maxconn} in use)")
+                waited = time.monotonic() - started
+                try:
+                    conn = self._checkout()
+                except Exception:
+                    self._slots.release()
+                    raise
+                with self._lock:
+                    self.stats['checkouts'] += 1
+                    if waited > 0.001:
+                        self.stats['waited'] += 1
+                    self.stats['wait_seconds'] += waited
+                    self.stats['max_wait_seconds'] = max(self.stats['max_wait_seconds'], waited)
+                return conn
+            
+            def _checkout(self):
+                """Newest idle connection that passes the age/ping checks, else a new one"""
+                while True:
+                    with self._lock:
+                        conn = self._idle.pop() if self._idle else None
+                    if conn is None:
+                        return self._connect()
+                    now = time.monotonic()
+                    if conn.closed:
+                        self._discard(conn, 'dead')
+                    elif now - conn.opened_at > self.recycle:
+                        self._discard(conn, 'recycled')
+                    elif now - conn.last_used > self.ping_after:
+                        try:
+                            with conn.cursor() as cursor:
+                                cursor.execute('SELECT 1')
+                            conn.rollback()
+                            return conn
+                        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                            self._discard(conn, 'dead')
+                    else:
+                        return conn
+            
+            def putconn(self, conn):
+                """Give a connection back (closed instead if it broke while in use)"""
+                try:
+                    if conn.closed or conn.info.transaction_status == TRANSACTION_STATUS_UNKNOWN:
+                        self._discard(conn, 'dead')
+                    elif self._closed:
+                        self._discard(conn)
+                    else:
+                        if conn.info.transaction_status != TRANSACTION_STATUS_IDLE:
+                            conn.rollback()
+                        conn.last_used = time.monotonic()
+                        with self._lock:
+                            self._idle.append(conn)
+                except Exception:
+                    self._discard(conn, 'dead')
+                finally:
+                    self._slots.release()
+            
+            def gauges(self) -> Dict:
+                """In-use / idle connections and checkout wait times"""
+                with self._lock:
+                    checkouts = self.stats['checkouts']
+                    return {
+                        'in_use': self._opened - len(self._idle),
+                        'idle': len(self._idle),
+                        'max': self.maxconn,
+                        'avg_wait_ms': self.stats['wait_seconds'] / checkouts * 1000 if checkouts else 0,
+                        'max_wait_ms': self.stats['max_wait_seconds'] * 1000,
+                        **self.stats,
+                    }
+            
+            def closeall(self):
+                """Close every idle connection, and each checked-out one when it is returned"""
+                with self._lock:
+                    self._closed = True
+                    idle, self._idle = self._idle, []
+                for conn in idle:
+                    self._discard(conn)
+        
+        # Transaction-mode pooling hands each transaction a different server connection,
+        # so a PREPARE from one call would be missing (or clash) on the next
+        pooler = urlparse(DATABASE_URL).port == PGBOUNCER_PORT
+        use_prepared = PG_PREPARE == 'on' or (PG_PREPARE == 'auto' and not pooler)
+        logger.info(f"PostgreSQL prepared statements {'on' if use_prepared else 'off'} (PG_PREPARE={PG_PREPARE})")
+        
         # Create connection pool with retry mechanism
         max_retries = 3
         for attempt in range(max_retries):
             try:
-                db_pool = pg_pool.ThreadedConnectionPool(1, 20, dsn=DATABASE_URL)
-                # Test connection
+                db_pool = BlockingConnectionPool(DB_POOL_MIN, DB_POOL_MAX, DB_POOL_TIMEOUT, DB_POOL_RECYCLE,
+                                                 DB_POOL_PING_AFTER, dsn=DATABASE_URL,
+                                                 connection_factory=PreparingConnection)
+                # Test connection (and keep it - it goes back to the pool open)
                 test_conn = db_pool.getconn()
-                test_conn.close()
-                db_pool.putconn(test_conn)
-                logger.info("Using PostgreSQL database (connection successful)")
+                try:
+                    with test_conn.cursor() as cursor:
+                        cursor.execute('SELECT 1')
+                    test_conn.rollback()
+                finally:
+                    db_pool.putconn(test_conn)
+                logger.info(f"Using PostgreSQL database (connection successful, pool {DB_POOL_MIN}-{DB_POOL_MAX})")
                 break
             except Exception as e:
                 if attempt < max_retries - 1:
                     logger.warning(f"PostgreSQL connection attempt {attempt + 1} failed: {e}, retrying...")
-                    import time
                     time.sleep(2)
                 else:
                     logger.error(f"PostgreSQL connection failed after {max_retries} attempts: {e}")
                     raise
         
         def get_connection():
-            return db_pool.getconn()
+            """Borrow a pooled connection (waits up to DB_POOL_TIMEOUT, then raises PoolTimeout)"""
+            try:
+                return db_pool.getconn()
+            except PoolTimeout as e:
+                logger.error(f"Database pool exhausted: {e}")
+                raise
         
         def return_connection(conn):
             db_pool.putconn(conn)
         
-        def execute_query(query, params=(), fetch=None):
-            """Execute PostgreSQL query"""
+        def pool_gauges() -> Dict:
+            """In-use / idle connections and checkout wait times"""
+            return db_pool.gauges()
+        
+        def close_pool():
+            """Close the pooled connections (shutdown)"""
+            db_pool.closeall()
+        
+        def execute_query(query, params=(), fetch=None, raise_errors=False):
+            """Execute PostgreSQL query (hot registry statements run as prepared statements)"""
             conn = get_connection()
+            name = _statement_names.get(query, 'other')
+            started = time.perf_counter()
             try:
                 if fetch == 'dict':
                     cursor = conn.cursor(cursor_factory=RealDictCursor)
                 else:
                     cursor = conn.cursor()
                 
-                cursor.execute(query, params)
+                prepared = _prepared_statements.get(query)
+                if prepared is None:
+                    cursor.execute(query, params)
+                else:
+                    prepare_sql, execute_sql = prepared
+                    if name not in conn.prepared:
+                        # PREPARE is not undone by a rollback, so the set stays accurate
+                        cursor.execute(prepare_sql)
+                        conn.prepared.add(name)
+                    try:
+                        cursor.execute(execute_sql, params)
+                    except pg_errors.InvalidSqlStatementName:
+                        # Server lost it (DEALLOCATE, or a pooler behind PG_PREPARE=on) - prepare again, retry once
+                        conn.rollback()
+                        cursor.execute(prepare_sql)
+                        cursor.execute(execute_sql, params)
                 
                 if fetch == 'one':
                     result = cursor.fetchone()
@@ -126,9 +344,12 @@ if USE_POSTGRES:
             except Exception as e:
                 conn.rollback()
                 logger.error(f"Database error: {e}")
+                if raise_errors:
+                    raise
                 return None if fetch else False
             finally:
                 return_connection(conn)
+                _record_statement(name, time.perf_counter() - started)
         
     except Exception as e:
         logger.error(f"PostgreSQL initialization failed: {e}")
@@ -138,18 +359,79 @@ if USE_POSTGRES:
 # SQLite implementation (default)
 if not USE_POSTGRES:
     import sqlite3
+    import queue
     DB_PATH = "telegram_bot.db"
+    SQLITE_POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", "8"))  # Long-lived connections (match the DB thread pool)
+    SQLITE_BUSY_TIMEOUT = 5  # Seconds a writer waits for the lock before "database is locked"
+    SQLITE_CACHED_STATEMENTS = 256  # Prepared statements kept per connection
     logger.info("Using SQLite database")
     
+    _sqlite_pool = queue.LifoQueue()
+    _sqlite_pool_lock = threading.Lock()
+    _sqlite_pool_opened = 0
+    _sqlite_pool_closed = False
+    
+    def _open_connection():
+        """Open a connection tuned for many short concurrent transactions"""
+        conn = sqlite3.connect(DB_PATH, check_same_thread=False, timeout=SQLITE_BUSY_TIMEOUT,
+                               cached_statements=SQLITE_CACHED_STATEMENTS)
+        # WAL lets readers run alongside the writer; NORMAL only syncs at checkpoints in WAL mode
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(f'PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT * 1000}')
+        return conn
+    
     def get_connection():
-        return sqlite3.connect(DB_PATH, check_same_thread=False)
+        """Borrow a pooled connection (opens a new one until the pool is full)"""
+        global _sqlite_pool_opened
+        try:
+            return _sqlite_pool.get_nowait()
+        except queue.Empty:
+            pass
+        with _sqlite_pool_lock:
+            if _sqlite_pool_opened < SQLITE_POOL_SIZE:
+                _sqlite_pool_opened += 1
+                try:
+                    return _open_connection()
+                except Exception:
+                    _sqlite_pool_opened -= 1
+                    raise
+        return _sqlite_pool.get()
     
     def return_connection(conn):
-        conn.close()
+        """Give a connection back to the pool (closed instead once the pool is shut down)"""
+        global _sqlite_pool_opened
+        if conn.in_transaction:
+            conn.rollback()
+        if _sqlite_pool_closed:
+            conn.close()
+            with _sqlite_pool_lock:
+                _sqlite_pool_opened -= 1
+            return
+        _sqlite_pool.put(conn)
+    
+    def pool_gauges() -> Dict:
+        """In-use / idle pooled connections"""
+        idle = _sqlite_pool.qsize()
+        return {'in_use': _sqlite_pool_opened - idle, 'idle': idle, 'max': SQLITE_POOL_SIZE}
     
-    def execute_query(query, params=(), fetch=None):
-        """Execute SQLite query"""
+    def close_pool():
+        """Close the pooled connections (shutdown) - checked-out ones are closed when returned"""
+        global _sqlite_pool_closed, _sqlite_pool_opened
+        _sqlite_pool_closed = True
+        while True:
+            try:
+                conn = _sqlite_pool.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with _sqlite_pool_lock:
+                _sqlite_pool_opened -= 1
+    
+    def execute_query(query, params=(), fetch=None, raise_errors=False):
+        """Execute SQLite query (raise_errors: re-raise instead of returning None/False)"""
         conn = get_connection()
+        started = time.perf_counter()
         try:
             cursor = conn.cursor()
             cursor.execute(query, params)
@@ -175,15 +457,182 @@ if not USE_POSTGRES:
         except Exception as e:
             conn.rollback()
             logger.error(f"Database error: {e}")
+            if raise_errors:
+                raise
             return None if fetch else False
         finally:
             return_connection(conn)
+            _record_statement(_statement_names.get(query, 'other'), time.perf_counter() - started)
+
+# Statements for the active backend (placeholders translated once, here)
+SQL = statements_for('psycopg2' if USE_POSTGRES else 'sqlite')
+_statement_names = {query: name for name, query in SQL.items()}
+
+# Hot statements PREPAREd once per pooled PostgreSQL connection, then run with EXECUTE
+PREPARED_STATEMENTS = (
+    'get_user', 'add_or_update_user', 'set_user_approved', 'add_user_stats', 'add_daily_stats',
+    'get_number_progress', 'init_number_progress', 'ensure_number_progress', 'link_site', 'unlink_site',
+    'get_linked_mask', 'mark_number_completed', 'complete_number_and_credit', 'save_session',
+)
+_prepared_statements = {}  # psycopg2 SQL -> (PREPARE ..., EXECUTE ...)
+if USE_POSTGRES and use_prepared:
+    numbered = statements_for('asyncpg')  # PREPARE bodies take $n placeholders
+    for name in PREPARED_STATEMENTS:
+        count = count_params(numbered[name])
+        execute_sql = f"EXECUTE {name} ({', '.join(['%s'] * count)})" if count else f"EXECUTE {name}"
+        _prepared_statements[SQL[name]] = (f"PREPARE {name} AS {numbered[name]}", execute_sql)
 
 # Database functions that work with both SQLite and PostgreSQL
+def _migrate_linked_mask(columns, execute):
+    """Add number_progress.linked_mask to older databases and fill it from site1..4_linked"""
+    if 'linked_mask' in columns:
+        return
+    execute('ALTER TABLE number_progress ADD COLUMN linked_mask INTEGER DEFAULT 0')
+    if 'site1_linked' in columns:
+        execute('UPDATE number_progress SET linked_mask = '
+                'site1_linked | (site2_linked << 1) | (site3_linked << 2) | (site4_linked << 3)')
+    logger.info("Migrated number_progress to linked_mask")
+
+def _migrate_session_cookie(columns, execute):
+    """Add sessions.cookie to older databases"""
+    if 'cookie' not in columns:
+        execute('ALTER TABLE sessions ADD COLUMN cookie TEXT')
+        logger.info("Added sessions.cookie")
+
+# Admin panel counters: one aggregate over users, or (ADMIN_SUMMARY=1) a summary row kept by triggers
+ADMIN_SUMMARY = os.getenv("ADMIN_SUMMARY", "0") == "1"  # Keep admin panel counters in a trigger-maintained row
+
+_ADMIN_SUMMARY_TABLE = """
+    CREATE TABLE IF NOT EXISTS admin_summary (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        approved_users BIGINT NOT NULL DEFAULT 0,
+        pending_users BIGINT NOT NULL DEFAULT 0,
+        today_numbers BIGINT NOT NULL DEFAULT 0,
+        total_numbers BIGINT NOT NULL DEFAULT 0
+    )
+"""
+
+# Each trigger adds the row's contribution after the change and subtracts the one before it
+_ADMIN_SUMMARY_SQLITE_DDL = [
+    _ADMIN_SUMMARY_TABLE,
+    """
+    CREATE TRIGGER IF NOT EXISTS admin_summary_insert AFTER INSERT ON users
+    BEGIN
+        UPDATE admin_summary SET
+            approved_users = approved_users + (NEW.approved = 1),
+            pending_users = pending_users + (NEW.approved = 0),
+            today_numbers = today_numbers + (NEW.approved = 1) * COALESCE(NEW.daily_numbers, 0),
+            total_numbers = total_numbers + (NEW.approved = 1) * COALESCE(NEW.total_numbers, 0)
+        WHERE id = 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS admin_summary_update AFTER UPDATE OF approved, daily_numbers, total_numbers ON users
+    BEGIN
+        UPDATE admin_summary SET
+            approved_users = approved_users + (NEW.approved = 1) - (OLD.approved = 1),
+            pending_users = pending_users + (NEW.approved = 0) - (OLD.approved = 0),
+            today_numbers = today_numbers + (NEW.approved = 1) * COALESCE(NEW.daily_numbers, 0)
+                                          - (OLD.approved = 1) * COALESCE(OLD.daily_numbers, 0),
+            total_numbers = total_numbers + (NEW.approved = 1) * COALESCE(NEW.total_numbers, 0)
+                                          - (OLD.approved = 1) * COALESCE(OLD.total_numbers, 0)
+        WHERE id = 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS admin_summary_delete AFTER DELETE ON users
+    BEGIN
+        UPDATE admin_summary SET
+            approved_users = approved_users - (OLD.approved = 1),
+            pending_users = pending_users - (OLD.approved = 0),
+            today_numbers = today_numbers - (OLD.approved = 1) * COALESCE(OLD.daily_numbers, 0),
+            total_numbers = total_numbers - (OLD.approved = 1) * COALESCE(OLD.total_numbers, 0)
+        WHERE id = 1;
+    END
+    """,
+]
+
+_ADMIN_SUMMARY_POSTGRES_DDL = [
+    _ADMIN_SUMMARY_TABLE,
+    """
+    CREATE OR REPLACE FUNCTION admin_summary_apply() RETURNS trigger AS $$
+    DECLARE
+        d_approved BIGINT := 0;
+        d_pending BIGINT := 0;
+        d_today BIGINT := 0;
+        d_total BIGINT := 0;
+    BEGIN
+        IF TG_OP <> 'DELETE' THEN
+            d_approved := (NEW.approved = 1)::int;
+            d_pending := (NEW.approved = 0)::int;
+            IF NEW.approved = 1 THEN
+                d_today := COALESCE(NEW.daily_numbers, 0);
+                d_total := COALESCE(NEW.total_numbers, 0);
+            END IF;
+        END IF;
+        IF TG_OP <> 'INSERT' THEN
+            d_approved := d_approved - (OLD.approved = 1)::int;
+            d_pending := d_pending - (OLD.approved = 0)::int;
+            IF OLD.approved = 1 THEN
+                d_today := d_today - COALESCE(OLD.daily_numbers, 0);
+                d_total := d_total - COALESCE(OLD.total_numbers, 0);
+            END IF;
+        END IF;
+        -- Profile-only updates do not touch (or lock) the summary row
+        IF d_approved <> 0 OR d_pending <> 0 OR d_today <> 0 OR d_total <> 0 THEN
+            UPDATE admin_summary SET
+                approved_users = approved_users + d_approved,
+                pending_users = pending_users + d_pending,
+                today_numbers = today_numbers + d_today,
+                total_numbers = total_numbers + d_total
+            WHERE id = 1;
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS admin_summary_users ON users",
+    """
+    CREATE TRIGGER admin_summary_users
+    AFTER INSERT OR UPDATE OF approved, daily_numbers, total_numbers OR DELETE ON users
+    FOR EACH ROW EXECUTE FUNCTION admin_summary_apply()
+    """,
+]
+
+# With ADMIN_SUMMARY off, triggers left by an earlier run would keep updating the summary row on every write
+_ADMIN_SUMMARY_SQLITE_DROP = [
+    "DROP TRIGGER IF EXISTS admin_summary_insert",
+    "DROP TRIGGER IF EXISTS admin_summary_update",
+    "DROP TRIGGER IF EXISTS admin_summary_delete",
+]
+
+_ADMIN_SUMMARY_POSTGRES_DROP = [
+    "DROP TRIGGER IF EXISTS admin_summary_users ON users",
+    "DROP FUNCTION IF EXISTS admin_summary_apply()",
+]
+
 def init_db():
     """Initialize database - creates tables if using SQLite, skips if PostgreSQL"""
     if USE_POSTGRES:
         logger.info("PostgreSQL database - tables should already exist in Supabase")
+        rows = execute_query("SELECT column_name FROM information_schema.columns WHERE table_name = 'number_progress'",
+                             fetch='all')
+        if rows:
+            _migrate_linked_mask({row[0] for row in rows}, execute_query)
+        rows = execute_query("SELECT column_name FROM information_schema.columns WHERE table_name = 'sessions'",
+                             fetch='all')
+        if rows:
+            _migrate_session_cookie({row[0] for row in rows}, execute_query)
+        if ADMIN_SUMMARY:
+            for statement in _ADMIN_SUMMARY_POSTGRES_DDL:
+                execute_query(statement)
+            execute_query(SQL['refresh_admin_summary'])
+            logger.info("Admin summary row maintained by trigger")
+        elif execute_query("SELECT 1 FROM pg_trigger WHERE tgname = 'admin_summary_users'", fetch='one'):
+            # Only when present - DROP TRIGGER locks users even if there is nothing to drop
+            for statement in _ADMIN_SUMMARY_POSTGRES_DROP:
+                execute_query(statement)
+            logger.info("Admin summary trigger removed (ADMIN_SUMMARY is off)")
         return
     
     # SQLite - create tables
@@ -208,16 +657,15 @@ def init_db():
         CREATE TABLE IF NOT EXISTS number_progress (
             phone_number TEXT PRIMARY KEY,
             user_id INTEGER,
-            site1_linked INTEGER DEFAULT 0,
-            site2_linked INTEGER DEFAULT 0,
-            site3_linked INTEGER DEFAULT 0,
-            site4_linked INTEGER DEFAULT 0,
+            linked_mask INTEGER DEFAULT 0,
             completed INTEGER DEFAULT 0,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             FOREIGN KEY (user_id) REFERENCES users(user_id)
         )
     ''')
+    _migrate_linked_mask({row[1] for row in cursor.execute('PRAGMA table_info(number_progress)').fetchall()},
+                         cursor.execute)
     
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS daily_stats (
@@ -234,9 +682,12 @@ def init_db():
         CREATE TABLE IF NOT EXISTS sessions (
             site_key TEXT PRIMARY KEY,
             token TEXT,
+            cookie TEXT,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
     ''')
+    _migrate_session_cookie({row[1] for row in cursor.execute('PRAGMA table_info(sessions)').fetchall()},
+                            cursor.execute)
     
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS activity_log (
@@ -248,238 +699,392 @@ def init_db():
         )
     ''')
     
+    if ADMIN_SUMMARY:
+        for statement in _ADMIN_SUMMARY_SQLITE_DDL:
+            cursor.execute(statement)
+        # Rebuilt at every start, so counts stay exact even after running with the summary off
+        cursor.execute(SQL['refresh_admin_summary'])
+    else:
+        for statement in _ADMIN_SUMMARY_SQLITE_DROP:
+            cursor.execute(statement)
+    
     conn.commit()
     cursor.close()
     return_connection(conn)
     logger.info("SQLite database initialized")
 
+# In-process user cache (get_user runs on every message, mostly to check approved)
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))  # Seconds a cached user record is trusted (0 = no cache)
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "4096"))  # Max cached users, least recently used are evicted
+
+class UserCache:
+    """TTL + LRU cache of user records, invalidated by every users write made through this module"""
+    
+    MISS = object()  # get() result when the caller has to load from the database
+    
+    def __init__(self, ttl: float, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()  # user_id -> (expires_at, record or None)
+        self._lock = threading.Lock()
+        # Bumped on every invalidation; a load that started before one is not stored
+        self.generation = 0
+        self.stats = {'hits': 0, 'misses': 0, 'invalidations': 0, 'evictions': 0}
+    
+    def get(self, user_id: int):
+        """Copy of the cached record (None = no such user) or MISS"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] < time.monotonic():
+                self.stats['misses'] += 1
+                return self.MISS
+            self._entries.move_to_end(user_id)
+            self.stats['hits'] += 1
+            return dict(entry[1]) if entry[1] is not None else None
+    
+    def put(self, user_id: int, record: Optional[Dict], generation: int):
+        """Store a record loaded after reading `generation`, unless a write happened meanwhile"""
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._entries[user_id] = (time.monotonic() + self.ttl, dict(record) if record is not None else None)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.stats['evictions'] += 1
+    
+    def invalidate(self, user_id: int):
+        """Drop one user after a write"""
+        with self._lock:
+            self.generation += 1
+            self._entries.pop(user_id, None)
+            self.stats['invalidations'] += 1
+    
+    def clear(self):
+        """Drop every user (bulk writes)"""
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self.stats['invalidations'] += 1
+    
+    def size(self) -> int:
+        """Cached users"""
+        return len(self._entries)
+
+user_cache = UserCache(USER_CACHE_TTL, USER_CACHE_SIZE)
+
+def _load_user(user_id: int):
+    """Read a user row from the database (None = no such user, UserCache.MISS = query failed)"""
+    try:
+        return execute_query(SQL['get_user'], (user_id,), fetch='dict', raise_errors=True)
+    except Exception:
+        return UserCache.MISS  # Already logged by execute_query
+
 def get_user(user_id: int) -> Optional[Dict]:
-    """Get user from database"""
-    if USE_POSTGRES:
-        row = execute_query('SELECT * FROM users WHERE user_id = %s', (user_id,), fetch='dict')
-        return row
-    else:
-        row = execute_query('SELECT * FROM users WHERE user_id = ?', (user_id,), fetch='dict')
-        if row:
-            return {
-                'user_id': row['user_id'],
-                'username': row['username'],
-                'first_name': row['first_name'],
-                'last_name': row['last_name'],
-                'approved': row['approved'],
-                'balance': row['balance'],
-                'total_numbers': row['total_numbers'],
-                'daily_numbers': row['daily_numbers'],
-                'joined_at': row['joined_at']
-            }
+    """Get user (from user_cache while fresh; failed lookups are not cached)"""
+    cached = user_cache.get(user_id)
+    if cached is not UserCache.MISS:
+        return cached
+    generation = user_cache.generation
+    user = _load_user(user_id)
+    if user is UserCache.MISS:
         return None
+    user_cache.put(user_id, user, generation)
+    return user
 
 def add_or_update_user(user_id: int, username: str, first_name: str, last_name: str):
-    """Add or update user"""
-    if USE_POSTGRES:
-        execute_query('''
-            INSERT INTO users (user_id, username, first_name, last_name, approved)
-            VALUES (%s, %s, %s, %s, 0)
-            ON CONFLICT (user_id) DO UPDATE SET username = %s, first_name = %s, last_name = %s
-        ''', (user_id, username, first_name, last_name, username, first_name, last_name))
-    else:
-        execute_query('''
-            INSERT OR REPLACE INTO users (user_id, username, first_name, last_name, approved)
-            VALUES (?, ?, ?, ?, COALESCE((SELECT approved FROM users WHERE user_id = ?), 0))
-        ''', (user_id, username, first_name, last_name, user_id))
+    """Add or update user (keeps approval, balance and totals of existing users)"""
+    execute_query(SQL['add_or_update_user'], (user_id, username, first_name, last_name))
+    user_cache.invalidate(user_id)
 
 def approve_user(user_id: int):
     """Approve user"""
-    if USE_POSTGRES:
-        execute_query('UPDATE users SET approved = 1 WHERE user_id = %s', (user_id,))
-    else:
-        execute_query('UPDATE users SET approved = 1 WHERE user_id = ?', (user_id,))
+    execute_query(SQL['set_user_approved'], (1, user_id))
+    user_cache.invalidate(user_id)
 
 def reject_user(user_id: int):
     """Reject user"""
-    if USE_POSTGRES:
-        execute_query('UPDATE users SET approved = -1 WHERE user_id = %s', (user_id,))
-    else:
-        execute_query('UPDATE users SET approved = -1 WHERE user_id = ?', (user_id,))
+    execute_query(SQL['set_user_approved'], (-1, user_id))
+    user_cache.invalidate(user_id)
 
 def update_user_stats(user_id: int, numbers_added: int = 0, earnings: float = 0):
     """Update user statistics"""
-    if USE_POSTGRES:
-        execute_query('''
-            UPDATE users 
-            SET total_numbers = total_numbers + %s,
-                daily_numbers = daily_numbers + %s,
-                balance = balance + %s
-            WHERE user_id = %s
-        ''', (numbers_added, numbers_added, earnings, user_id))
-        
-        from datetime import datetime
-        import pytz
-        BANGLADESH_TZ = pytz.timezone('Asia/Dhaka')
-        today = datetime.now(BANGLADESH_TZ).strftime('%Y-%m-%d')
-        execute_query('''
-            INSERT INTO daily_stats (user_id, date, numbers_added, earnings)
-            VALUES (%s, %s, %s, %s)
-            ON CONFLICT (user_id, date) DO UPDATE SET
-                numbers_added = daily_stats.numbers_added + %s,
-                earnings = daily_stats.earnings + %s
-        ''', (user_id, today, numbers_added, earnings, numbers_added, earnings))
-    else:
-        execute_query('''
-            UPDATE users 
-            SET total_numbers = total_numbers + ?,
-                daily_numbers = daily_numbers + ?,
-                balance = balance + ?
-            WHERE user_id = ?
-        ''', (numbers_added, numbers_added, earnings, user_id))
-        
-        from datetime import datetime
-        import pytz
-        BANGLADESH_TZ = pytz.timezone('Asia/Dhaka')
-        today = datetime.now(BANGLADESH_TZ).strftime('%Y-%m-%d')
-        execute_query('''
-            INSERT INTO daily_stats (user_id, date, numbers_added, earnings)
-            VALUES (?, ?, ?, ?)
-            ON CONFLICT(user_id, date) DO UPDATE SET
-                numbers_added = numbers_added + ?,
-                earnings = earnings + ?
-        ''', (user_id, today, numbers_added, earnings, numbers_added, earnings))
+    import pytz
+    BANGLADESH_TZ = pytz.timezone('Asia/Dhaka')
+    today = datetime.now(BANGLADESH_TZ).strftime('%Y-%m-%d')
+    execute_query(SQL['add_user_stats'], (numbers_added, numbers_added, earnings, user_id))
+    execute_query(SQL['add_daily_stats'], (user_id, today, numbers_added, earnings))
+    user_cache.invalidate(user_id)
 
 def reset_daily_stats():
     """Reset daily statistics"""
-    if USE_POSTGRES:
-        execute_query('UPDATE users SET daily_numbers = 0')
-        execute_query('DELETE FROM number_progress WHERE completed = 0')
-    else:
-        execute_query('UPDATE users SET daily_numbers = 0')
-        execute_query('DELETE FROM number_progress WHERE completed = 0')
+    execute_query(SQL['reset_daily_numbers'])
+    execute_query(SQL['delete_incomplete_progress'])
+    user_cache.clear()
     logger.info("Daily stats reset completed")
 
 def get_daily_report() -> List[Dict]:
-    """Get daily report"""
-    from datetime import datetime
+    """Get daily report (every approved user, most numbers first)"""
     import pytz
     BANGLADESH_TZ = pytz.timezone('Asia/Dhaka')
     today = datetime.now(BANGLADESH_TZ).strftime('%Y-%m-%d')
+    rows = execute_query(SQL['daily_report'], (today,), fetch='all')
+    columns = ['user_id', 'first_name', 'username', 'numbers_added', 'earnings']
+    return [dict(zip(columns, row)) for row in rows] if rows else []
+
+def _admin_totals(row) -> Dict:
+    """Admin counters row -> dict of ints"""
+    return {key: int((row or {}).get(key) or 0)
+            for key in ('approved_users', 'pending_users', 'today_numbers', 'total_numbers')}
+
+def get_admin_totals() -> Dict:
+    """Approved / pending users and today's / all-time numbers of approved users, in one query"""
+    row = execute_query(SQL['admin_summary'], fetch='dict') if ADMIN_SUMMARY else None
+    if row is None:
+        row = execute_query(SQL['admin_totals'], fetch='dict')
+    return _admin_totals(row)
+
+# Activity log write-behind buffer (audit rows are batched off the request path)
+ACTIVITY_LOG_BATCH_SIZE = int(os.getenv("ACTIVITY_LOG_BATCH_SIZE", "200"))  # Flush as soon as this many rows are queued
+ACTIVITY_LOG_FLUSH_INTERVAL = float(os.getenv("ACTIVITY_LOG_FLUSH_INTERVAL", "2"))  # Max seconds a row waits before flush
+ACTIVITY_LOG_MAX_PENDING = int(os.getenv("ACTIVITY_LOG_MAX_PENDING", "10000"))  # Rows kept in memory; the oldest are dropped beyond this
+
+def _write_activity_rows(rows) -> bool:
+    """Insert many activity_log rows in one transaction (False if they could not be written)"""
+    try:
+        conn = get_connection()
+    except Exception as e:
+        logger.error(f"Activity log flush failed ({len(rows)} rows): {e}")
+        return False
+    try:
+        cursor = conn.cursor()
+        if USE_POSTGRES:
+            execute_values(cursor, 'INSERT INTO activity_log (user_id, action, details, timestamp) VALUES %s',
+                           rows, page_size=ACTIVITY_LOG_BATCH_SIZE)
+        else:
+            cursor.executemany(SQL['insert_activity_log'], rows)
+        conn.commit()
+        cursor.close()
+        return True
+    except Exception as e:
+        conn.rollback()
+        logger.error(f"Activity log flush failed ({len(rows)} rows): {e}")
+        return False
+    finally:
+        return_connection(conn)
+
+class ActivityLogBuffer:
+    """Bounded in-memory queue of activity_log rows, flushed by a background thread"""
     
-    if USE_POSTGRES:
-        rows = execute_query('''
-            SELECT u.user_id, u.first_name, u.username,
-                   COALESCE(d.numbers_added, 0) as numbers_added,
-                   COALESCE(d.earnings, 0) as earnings
-            FROM users u
-            LEFT JOIN daily_stats d ON u.user_id = d.user_id AND d.date = %s
-            WHERE u.approved = 1
-            ORDER BY d.numbers_added DESC NULLS LAST
-        ''', (today,), fetch='all')
-        return [dict(row) for row in rows] if rows else []
-    else:
-        rows = execute_query('''
-            SELECT u.user_id, u.first_name, u.username, d.numbers_added, d.earnings
-            FROM users u
-            LEFT JOIN daily_stats d ON u.user_id = d.user_id AND d.date = ?
-            WHERE u.approved = 1 AND (d.numbers_added > 0 OR d.numbers_added IS NULL)
-            ORDER BY d.numbers_added DESC
-        ''', (today,), fetch='all')
-        if rows:
-            columns = ['user_id', 'first_name', 'username', 'numbers_added', 'earnings']
-            return [dict(zip(columns, row)) for row in rows]
-        return []
+    def __init__(self, batch_size: int, flush_interval: float, max_pending: int):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._rows = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = False
+        self._thread = None
+        self._last_flush_ok = True
+        # Row counters; backpressure = producers that had to write the backlog themselves before continuing
+        self.stats = {'queued': 0, 'written': 0, 'dropped': 0, 'backpressure': 0, 'flushes': 0, 'failed_flushes': 0}
+    
+    def append(self, user_id: int, action: str, details: str) -> bool:
+        """Queue one row (never blocks on the database); True if the caller should apply_backpressure()"""
+        # Event time, not flush time - same format as CURRENT_TIMESTAMP (UTC)
+        row = (user_id, action, details, datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S'))
+        with self._lock:
+            if len(self._rows) >= self.max_pending:
+                # Hard memory bound (database unreachable): keep the newest rows
+                del self._rows[0]
+                self.stats['dropped'] += 1
+            self._rows.append(row)
+            self.stats['queued'] += 1
+            pending = len(self._rows)
+            if self._thread is None and not self._stopped:
+                self._thread = threading.Thread(target=self._run, name="activity-log", daemon=True)
+                self._thread.start()
+        
+        if pending >= self.batch_size:
+            self._wake.set()
+        # Two or more batches waiting: the writer is behind - unless the database is down, then just buffer
+        return pending >= self.batch_size * 2 and self._last_flush_ok
+    
+    def apply_backpressure(self):
+        """Write the backlog on the producer's thread (after any flush in progress) before it queues more"""
+        self.stats['backpressure'] += 1
+        self.flush()
+    
+    def pending(self) -> int:
+        """Rows waiting to be written"""
+        return len(self._rows)
+    
+    def flush(self) -> int:
+        """Write all queued rows now; returns the number written"""
+        with self._flush_lock:
+            with self._lock:
+                rows, self._rows = self._rows, []
+            if not rows:
+                return 0
+            
+            self._last_flush_ok = _write_activity_rows(rows)
+            if self._last_flush_ok:
+                self.stats['written'] += len(rows)
+                self.stats['flushes'] += 1
+                return len(rows)
+            
+            # Keep the rows for the next attempt, as far as the bound allows (oldest dropped first)
+            self.stats['failed_flushes'] += 1
+            with self._lock:
+                keep = max(0, self.max_pending - len(self._rows))
+                self.stats['dropped'] += max(0, len(rows) - keep)
+                self._rows[:0] = rows[len(rows) - keep:]
+            return 0
+    
+    def _run(self):
+        """Flush every flush_interval, or sooner when a batch is full"""
+        while not self._stopped:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Activity log flush error: {e}")
+    
+    def close(self):
+        """Stop the flush thread and write what is left"""
+        self._stopped = True
+        self._wake.set()
+        written = self.flush()
+        if written or self.stats['dropped']:
+            logger.info(f"Activity log closed: {self.stats}")
+
+activity_log_buffer = ActivityLogBuffer(ACTIVITY_LOG_BATCH_SIZE, ACTIVITY_LOG_FLUSH_INTERVAL, ACTIVITY_LOG_MAX_PENDING)
+# atexit runs last-registered first: flush the buffered rows, then close the connection pool
+atexit.register(close_pool)
+atexit.register(activity_log_buffer.close)
 
 def log_activity(user_id: int, action: str, details: str = ""):
-    """Log user activity"""
-    if USE_POSTGRES:
-        execute_query('INSERT INTO activity_log (user_id, action, details) VALUES (%s, %s, %s)',
-                     (user_id, action, details))
-    else:
-        execute_query('INSERT INTO activity_log (user_id, action, details) VALUES (?, ?, ?)',
-                     (user_id, action, details))
+    """Log user activity (buffered - written in batches by activity_log_buffer)"""
+    if activity_log_buffer.append(user_id, action, details):
+        activity_log_buffer.apply_backpressure()
 
-def get_number_progress(phone: str):
-    """Get progress for a phone number"""
-    if USE_POSTGRES:
-        row = execute_query('SELECT * FROM number_progress WHERE phone_number = %s', (phone,), fetch='dict')
-        if row:
-            return {
-                'phone_number': row['phone_number'],
-                'user_id': row['user_id'],
-                'site1_linked': bool(row['site1_linked']),
-                'site2_linked': bool(row['site2_linked']),
-                'site3_linked': bool(row['site3_linked']),
-                'site4_linked': bool(row['site4_linked']),
-                'completed': bool(row['completed']),
-                'created_at': row['created_at'],
-                'last_updated': row['last_updated']
-            }
-        return None
-    else:
-        row = execute_query('SELECT * FROM number_progress WHERE phone_number = ?', (phone,), fetch='dict')
-        if row:
-            return {
-                'phone_number': row['phone_number'],
-                'user_id': row['user_id'],
-                'site1_linked': bool(row['site1_linked']),
-                'site2_linked': bool(row['site2_linked']),
-                'site3_linked': bool(row['site3_linked']),
-                'site4_linked': bool(row['site4_linked']),
-                'completed': bool(row['completed']),
-                'created_at': row['created_at'],
-                'last_updated': row['last_updated']
-            }
+def _sqlite_write_and_read_progress(query: str, params: tuple, phone: str) -> Optional[NumberProgress]:
+    """Run one write on number_progress and read the row back on the same connection/transaction"""
+    conn = get_connection()
+    try:
+        conn.execute(query, params)
+        cursor = conn.execute(SQL['get_number_progress'], (phone,))
+        row = cursor.fetchone()
+        columns = [desc[0] for desc in cursor.description]
+        conn.commit()
+        return NumberProgress.from_row(dict(zip(columns, row)) if row else None)
+    except Exception as e:
+        conn.rollback()
+        logger.error(f"Database error: {e}")
         return None
+    finally:
+        return_connection(conn)
+
+def get_number_progress(phone: str) -> Optional[NumberProgress]:
+    """Get progress for a phone number"""
+    return NumberProgress.from_row(execute_query(SQL['get_number_progress'], (phone,), fetch='dict'))
 
 def init_number_progress(phone: str, user_id: int):
     """Initialize progress tracking"""
+    execute_query(SQL['init_number_progress'], (phone, user_id))
+
+def ensure_number_progress(phone: str, user_id: int) -> Optional[NumberProgress]:
+    """Create the progress row if missing and return the current progress (one round trip)"""
     if USE_POSTGRES:
-        execute_query('INSERT INTO number_progress (phone_number, user_id) VALUES (%s, %s) ON CONFLICT DO NOTHING',
-                     (phone, user_id))
-    else:
-        execute_query('INSERT OR IGNORE INTO number_progress (phone_number, user_id) VALUES (?, ?)',
-                     (phone, user_id))
+        return NumberProgress.from_row(execute_query(SQL['ensure_number_progress'], (phone, user_id), fetch='dict'))
+    return _sqlite_write_and_read_progress(SQL['ensure_number_progress'], (phone, user_id), phone)
 
-def update_site_progress(phone: str, site_index: int, linked: bool = True):
-    """Update site progress"""
-    site_col = f'site{site_index}_linked'
+def update_site_progress(phone: str, site_index: int, linked: bool = True) -> Optional[NumberProgress]:
+    """Set or clear one site's bit and return the new progress"""
+    query = SQL['link_site'] if linked else SQL['unlink_site']
+    params = (NumberProgress.site_bit(site_index), phone)
     if USE_POSTGRES:
-        execute_query(f'UPDATE number_progress SET {site_col} = %s, last_updated = CURRENT_TIMESTAMP WHERE phone_number = %s',
-                     (1 if linked else 0, phone))
-    else:
-        execute_query(f'UPDATE number_progress SET {site_col} = ?, last_updated = CURRENT_TIMESTAMP WHERE phone_number = ?',
-                     (1 if linked else 0, phone))
+        return NumberProgress.from_row(execute_query(query, params, fetch='dict'))
+    return _sqlite_write_and_read_progress(query, params, phone)
 
 def check_and_complete_number(phone: str):
     """Check if all sites linked"""
-    if USE_POSTGRES:
-        row = execute_query('SELECT site1_linked, site2_linked, site3_linked, site4_linked FROM number_progress WHERE phone_number = %s',
-                           (phone,), fetch='one')
-    else:
-        row = execute_query('SELECT site1_linked, site2_linked, site3_linked, site4_linked FROM number_progress WHERE phone_number = ?',
-                           (phone,), fetch='one')
-    
-    if row and all(row):
-        if USE_POSTGRES:
-            execute_query('UPDATE number_progress SET completed = 1, last_updated = CURRENT_TIMESTAMP WHERE phone_number = %s', (phone,))
-        else:
-            execute_query('UPDATE number_progress SET completed = 1, last_updated = CURRENT_TIMESTAMP WHERE phone_number = ?', (phone,))
+    full = NumberProgress.full_mask()
+    row = execute_query(SQL['get_linked_mask'], (phone,), fetch='one')
+    if row and ((row[0] or 0) & full) == full:
+        execute_query(SQL['mark_number_completed'], (phone,))
         return True
     return False
 
+def complete_number_and_credit(phone: str, user_id: int, amount: float) -> Optional[Dict]:
+    """Mark a fully linked number completed and pay the user, in one transaction
+    
+    Returns the user's new balance/total_numbers/daily_numbers, or None if the number
+    is not fully linked or was already completed (so it can never be credited twice).
+    """
+    import pytz
+    BANGLADESH_TZ = pytz.timezone('Asia/Dhaka')
+    today = datetime.now(BANGLADESH_TZ).strftime('%Y-%m-%d')
+    full = NumberProgress.full_mask()
+    
+    if USE_POSTGRES:
+        # One statement: the completed = 0 guard row-locks the number, so concurrent callers credit once
+        row = execute_query(SQL['complete_number_and_credit'],
+                            (phone, full, full, amount, user_id, user_id, today, amount), fetch='dict')
+        if row:
+            user_cache.invalidate(user_id)
+        return row
+    
+    conn = get_connection()
+    try:
+        # Take the write lock up front so the completed = 0 check and the credit cannot interleave
+        conn.execute('BEGIN IMMEDIATE')
+        cursor = conn.execute(SQL['complete_number'], (phone, full, full))
+        if cursor.rowcount == 0:
+            conn.rollback()
+            return None
+        
+        conn.execute(SQL['add_user_stats'], (1, 1, amount, user_id))
+        conn.execute(SQL['add_daily_stats'], (user_id, today, 1, amount))
+        row = conn.execute(SQL['get_user_totals'], (user_id,)).fetchone()
+        conn.commit()
+        user_cache.invalidate(user_id)
+        if row:
+            return {'balance': row[0], 'total_numbers': row[1], 'daily_numbers': row[2]}
+        return None
+    except Exception as e:
+        conn.rollback()
+        logger.error(f"Database error: {e}")
+        return None
+    finally:
+        return_connection(conn)
+
 def get_incomplete_sites(phone: str) -> list:
     """Get incomplete sites"""
     progress = get_number_progress(phone)
     if not progress:
-        return [1, 2, 3, 4]
-    incomplete = []
-    for i in range(1, 5):
-        if not progress[f'site{i}_linked']:
-            incomplete.append(i)
-    return incomplete
+        return list(range(1, NumberProgress.site_count + 1))
+    return progress.incomplete_sites()
+
+def save_session(site_key: str, token: str, cookie: str = ''):
+    """Store the current session token (and Cloudflare cookie) of a site"""
+    execute_query(SQL['save_session'], (site_key, token, cookie))
+
+def load_sessions() -> Dict[str, Dict]:
+    """Get stored session tokens and cookies by site_key (created_at as epoch seconds)"""
+    rows = execute_query(SQL['load_sessions'], fetch='all')
+    return {
+        site_key: {'token': token, 'cookie': cookie or '', 'created_at': float(created_at or 0)}
+        for site_key, token, cookie, created_at in rows or []
+        if token
+    }
 
 def reset_daily_number_progress():
     """Reset incomplete progress"""
-    if USE_POSTGRES:
-        execute_query('DELETE FROM number_progress WHERE completed = 0')
-    else:
-        execute_query('DELETE FROM number_progress WHERE completed = 0')
+    execute_query(SQL['delete_incomplete_progress'])
     logger.info("Reset incomplete number progress")
 
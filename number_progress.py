@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Number Progress - per-site link progress of a phone number as one integer bitmask
+Bit (i - 1) of linked_mask is set once site i (1-based, in SITES order) is linked
+"""
+
+from typing import Optional, List
+
+
+class NumberProgress:
+    """Link progress of one phone number (number_progress row)"""
+    
+    __slots__ = ('phone_number', 'user_id', 'linked_mask', 'completed', 'created_at', 'last_updated')
+    
+    site_count = 4  # Number of sites - the bot sets this from len(SITES)
+    
+    def __init__(self, phone_number: str, user_id: int, linked_mask: int = 0, completed: bool = False,
+                 created_at=None, last_updated=None):
+        self.phone_number = phone_number
+        self.user_id = user_id
+        self.linked_mask = linked_mask or 0
+        self.completed = bool(completed)
+        self.created_at = created_at
+        self.last_updated = last_updated
+    
+    @classmethod
+    def from_row(cls, row) -> Optional['NumberProgress']:
+        """Build from a number_progress row (dict or mapping), None if no row"""
+        if not row:
+            return None
+        return cls(row['phone_number'], row['user_id'], row['linked_mask'], row['completed'],
+                   row['created_at'], row['last_updated'])
+    
+    @classmethod
+    def full_mask(cls) -> int:
+        """Mask with every site linked"""
+        return (1 << cls.site_count) - 1
+    
+    @staticmethod
+    def site_bit(site_index: int) -> int:
+        """Bit for a 1-based site index"""
+        return 1 << (site_index - 1)
+    
+    def is_linked(self, site_index: int) -> bool:
+        """Check if a site (1-based) is linked"""
+        return bool(self.linked_mask & self.site_bit(site_index))
+    
+    @property
+    def linked_count(self) -> int:
+        """Number of linked sites"""
+        return bin(self.linked_mask & self.full_mask()).count("1")
+    
+    @property
+    def all_linked(self) -> bool:
+        """Check if every site is linked"""
+        full = self.full_mask()
+        return (self.linked_mask & full) == full
+    
+    def incomplete_sites(self) -> List[int]:
+        """1-based indexes of the sites still to link"""
+        return [i for i in range(1, self.site_count + 1) if not self.linked_mask & (1 << (i - 1))]
+    
+    def __repr__(self):
+        return (f"NumberProgress({self.phone_number!r}, linked={self.linked_count}/{self.site_count}, "
+                f"completed={self.completed})")
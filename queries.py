@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Queries - every SQL statement the bot runs, written once with ? placeholders
+statements_for(dialect) translates them for sqlite3/aiosqlite (?), psycopg2 (%s) or asyncpg ($1..)
+"""
+
+import re
+from typing import Dict
+
+# number_progress columns read into NumberProgress
+PROGRESS_COLUMNS = 'phone_number, user_id, linked_mask, completed, created_at, last_updated'
+
+# Aggregate behind the admin panel counters (same column names as the admin_summary row)
+ADMIN_TOTALS_COLUMNS = ('COALESCE(SUM(CASE WHEN approved = 1 THEN 1 ELSE 0 END), 0) AS approved_users, '
+                        'COALESCE(SUM(CASE WHEN approved = 0 THEN 1 ELSE 0 END), 0) AS pending_users, '
+                        'COALESCE(SUM(CASE WHEN approved = 1 THEN daily_numbers ELSE 0 END), 0) AS today_numbers, '
+                        'COALESCE(SUM(CASE WHEN approved = 1 THEN total_numbers ELSE 0 END), 0) AS total_numbers')
+
+# name -> SQL shared by both backends, or {'sqlite': ..., 'postgres': ...} where they must differ
+STATEMENTS = {
+    # Users
+    'get_user': 'SELECT * FROM users WHERE user_id = ?',
+    'add_or_update_user': '''
+        INSERT INTO users (user_id, username, first_name, last_name, approved)
+        VALUES (?, ?, ?, ?, 0)
+        ON CONFLICT (user_id) DO UPDATE SET
+            username = excluded.username,
+            first_name = excluded.first_name,
+            last_name = excluded.last_name
+    ''',
+    'set_user_approved': 'UPDATE users SET approved = ? WHERE user_id = ?',
+    'add_user_stats': '''
+        UPDATE users
+        SET total_numbers = total_numbers + ?,
+            daily_numbers = daily_numbers + ?,
+            balance = balance + ?
+        WHERE user_id = ?
+    ''',
+    'get_user_totals': 'SELECT balance, total_numbers, daily_numbers FROM users WHERE user_id = ?',
+    'reset_daily_numbers': 'UPDATE users SET daily_numbers = 0',
+    
+    # Admin panel counters: one pass over users (approved users' numbers only)
+    'admin_totals': f'SELECT {ADMIN_TOTALS_COLUMNS} FROM users',
+    'admin_summary': 'SELECT approved_users, pending_users, today_numbers, total_numbers FROM admin_summary WHERE id = 1',
+    # Rebuild the summary row from users (WHERE clause: SQLite needs it before ON CONFLICT after a SELECT)
+    'refresh_admin_summary': f'''
+        INSERT INTO admin_summary (id, approved_users, pending_users, today_numbers, total_numbers)
+        SELECT 1, {ADMIN_TOTALS_COLUMNS} FROM users WHERE 1 = 1
+        ON CONFLICT (id) DO UPDATE SET
+            approved_users = excluded.approved_users,
+            pending_users = excluded.pending_users,
+            today_numbers = excluded.today_numbers,
+            total_numbers = excluded.total_numbers
+    ''',
+    
+    # Daily stats
+    'add_daily_stats': '''
+        INSERT INTO daily_stats (user_id, date, numbers_added, earnings)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT (user_id, date) DO UPDATE SET
+            numbers_added = daily_stats.numbers_added + excluded.numbers_added,
+            earnings = daily_stats.earnings + excluded.earnings
+    ''',
+    'daily_report': '''
+        SELECT u.user_id, u.first_name, u.username,
+               COALESCE(d.numbers_added, 0) AS numbers_added,
+               COALESCE(d.earnings, 0) AS earnings
+        FROM users u
+        LEFT JOIN daily_stats d ON u.user_id = d.user_id AND d.date = ?
+        WHERE u.approved = 1
+        ORDER BY numbers_added DESC, u.user_id
+    ''',
+    
+    # Number progress
+    'get_number_progress': f'SELECT {PROGRESS_COLUMNS} FROM number_progress WHERE phone_number = ?',
+    'init_number_progress': 'INSERT INTO number_progress (phone_number, user_id) VALUES (?, ?) ON CONFLICT DO NOTHING',
+    # PostgreSQL returns the row from the write (no-op DO UPDATE so existing rows come back too);
+    # SQLite reads it back in the same transaction
+    'ensure_number_progress': {
+        'sqlite': 'INSERT INTO number_progress (phone_number, user_id) VALUES (?, ?) ON CONFLICT DO NOTHING',
+        'postgres': f'''
+            INSERT INTO number_progress (phone_number, user_id) VALUES (?, ?)
+            ON CONFLICT (phone_number) DO UPDATE SET phone_number = EXCLUDED.phone_number
+            RETURNING {PROGRESS_COLUMNS}
+        ''',
+    },
+    'link_site': {
+        'sqlite': 'UPDATE number_progress SET linked_mask = linked_mask | ?, last_updated = CURRENT_TIMESTAMP '
+                  'WHERE phone_number = ?',
+        'postgres': 'UPDATE number_progress SET linked_mask = linked_mask | ?, last_updated = CURRENT_TIMESTAMP '
+                    f'WHERE phone_number = ? RETURNING {PROGRESS_COLUMNS}',
+    },
+    'unlink_site': {
+        'sqlite': 'UPDATE number_progress SET linked_mask = linked_mask & ~?, last_updated = CURRENT_TIMESTAMP '
+                  'WHERE phone_number = ?',
+        'postgres': 'UPDATE number_progress SET linked_mask = linked_mask & ~CAST(? AS INTEGER), last_updated = CURRENT_TIMESTAMP '
+                    f'WHERE phone_number = ? RETURNING {PROGRESS_COLUMNS}',
+    },
+    'get_linked_mask': 'SELECT linked_mask FROM number_progress WHERE phone_number = ?',
+    'mark_number_completed': 'UPDATE number_progress SET completed = 1, last_updated = CURRENT_TIMESTAMP WHERE phone_number = ?',
+    # Guarded by completed = 0 and the full site mask, so a number is only ever completed once
+    'complete_number': '''
+        UPDATE number_progress SET completed = 1, last_updated = CURRENT_TIMESTAMP
+        WHERE phone_number = ? AND completed = 0 AND (linked_mask & ?) = ?
+    ''',
+    # PostgreSQL: complete + credit + daily stats in one statement (params: phone, full, full, amount, user_id, user_id, date, amount)
+    'complete_number_and_credit': {
+        'postgres': '''
+            WITH done AS (
+                UPDATE number_progress SET completed = 1, last_updated = CURRENT_TIMESTAMP
+                WHERE phone_number = ? AND completed = 0 AND (linked_mask & ?) = ?
+                RETURNING phone_number
+            ), credited AS (
+                UPDATE users
+                SET total_numbers = total_numbers + 1,
+                    daily_numbers = daily_numbers + 1,
+                    balance = balance + CAST(? AS NUMERIC)
+                WHERE user_id = ? AND EXISTS (SELECT 1 FROM done)
+                RETURNING balance, total_numbers, daily_numbers
+            ), daily AS (
+                INSERT INTO daily_stats (user_id, date, numbers_added, earnings)
+                SELECT CAST(? AS BIGINT), CAST(? AS TEXT), 1, CAST(? AS NUMERIC) WHERE EXISTS (SELECT 1 FROM done)
+                ON CONFLICT (user_id, date) DO UPDATE SET
+                    numbers_added = daily_stats.numbers_added + 1,
+                    earnings = daily_stats.earnings + EXCLUDED.earnings
+            )
+            SELECT balance, total_numbers, daily_numbers FROM credited
+        ''',
+    },
+    'delete_incomplete_progress': 'DELETE FROM number_progress WHERE completed = 0',
+    
+    # Sessions
+    'save_session': '''
+        INSERT INTO sessions (site_key, token, cookie, created_at) VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT (site_key) DO UPDATE SET token = excluded.token, cookie = excluded.cookie,
+            created_at = excluded.created_at
+    ''',
+    'load_sessions': {
+        'sqlite': "SELECT site_key, token, cookie, CAST(strftime('%s', created_at) AS INTEGER) FROM sessions",
+        'postgres': 'SELECT site_key, token, cookie, EXTRACT(EPOCH FROM created_at) FROM sessions',
+    },
+    
+    # Activity log
+    'insert_activity_log': 'INSERT INTO activity_log (user_id, action, details, timestamp) VALUES (?, ?, ?, ?)',
+}
+
+# Driver -> statement family and placeholder style
+DIALECTS = {
+    'sqlite': ('sqlite', 'qmark'),
+    'psycopg2': ('postgres', 'format'),
+    'asyncpg': ('postgres', 'numeric'),
+}
+
+def translate(query: str, paramstyle: str) -> str:
+    """Rewrite ? placeholders (outside string literals) to the driver's paramstyle"""
+    if paramstyle == 'qmark':
+        return query
+    out = []
+    in_literal = False
+    count = 0
+    for ch in query:
+        if ch == "'":
+            in_literal = not in_literal
+        elif ch == '?' and not in_literal:
+            count += 1
+            out.append('%s' if paramstyle == 'format' else f'${count}')
+            continue
+        elif ch == '%' and paramstyle == 'format':
+            out.append('%%')  # psycopg2 always interpolates, literal % must be doubled
+            continue
+        out.append(ch)
+    return ''.join(out)
+
+def count_params(query: str) -> int:
+    """Number of parameters of a statement translated to $n placeholders"""
+    return max((int(n) for n in re.findall(r'\$(\d+)', query)), default=0)
+
+def count_placeholders(query: str) -> int:
+    """Number of ? placeholders outside string literals"""
+    count = 0
+    in_literal = False
+    for ch in query:
+        if ch == "'":
+            in_literal = not in_literal
+        elif ch == '?' and not in_literal:
+            count += 1
+    return count
+
+def check_translation(name: str, query: str, translated: str, paramstyle: str):
+    """Raise ValueError unless every ? became exactly one driver placeholder"""
+    expected = count_placeholders(query)
+    if paramstyle == 'qmark':
+        found = count_placeholders(translated)
+    elif count_placeholders(translated):
+        raise ValueError(f"Statement {name!r} ({paramstyle}): ? left after translation")
+    elif paramstyle == 'format':
+        found = translated.replace('%%', '').count('%s')
+    else:
+        found = len(re.findall(r'\$\d+', translated))
+        if found != count_params(translated):
+            raise ValueError(f"Statement {name!r} ({paramstyle}): $n placeholders are not numbered 1..{found}")
+    if found != expected:
+        raise ValueError(f"Statement {name!r} ({paramstyle}): {found} placeholders, expected {expected}")
+
+def statements_for(dialect: str) -> Dict[str, str]:
+    """All statements available on a driver, translated and checked once (call at import time)"""
+    family, paramstyle = DIALECTS[dialect]
+    statements = {}
+    for name, query in STATEMENTS.items():
+        if isinstance(query, dict):
+            if family not in query:
+                continue
+            query = query[family]
+        statements[name] = translate(query, paramstyle)
+        check_translation(name, query, statements[name], paramstyle)
+    return statements
+
+if __name__ == '__main__':
+    # python queries.py - translate and check the whole registry for every driver
+    for dialect in DIALECTS:
+        print(f"{dialect}: {len(statements_for(dialect))} statements OK")
@@ -24,10 +24,7 @@ CREATE INDEX IF NOT EXISTS idx_users_approved ON users(approved);
 CREATE TABLE IF NOT EXISTS number_progress (
     phone_number TEXT PRIMARY KEY,
     user_id BIGINT,
-    site1_linked INTEGER DEFAULT 0,
-    site2_linked INTEGER DEFAULT 0,
-    site3_linked INTEGER DEFAULT 0,
-    site4_linked INTEGER DEFAULT 0,
+    linked_mask INTEGER DEFAULT 0,  -- bit (i - 1) set when site i is linked
     completed INTEGER DEFAULT 0,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -38,6 +35,10 @@ CREATE TABLE IF NOT EXISTS number_progress (
 CREATE INDEX IF NOT EXISTS idx_number_progress_user ON number_progress(user_id);
 CREATE INDEX IF NOT EXISTS idx_number_progress_completed ON number_progress(completed);
 
+-- Existing databases: move site1..4_linked into linked_mask (old columns are left unused)
+-- ALTER TABLE number_progress ADD COLUMN IF NOT EXISTS linked_mask INTEGER DEFAULT 0;
+-- UPDATE number_progress SET linked_mask = site1_linked | (site2_linked << 1) | (site3_linked << 2) | (site4_linked << 3);
+
 -- Daily stats table
 CREATE TABLE IF NOT EXISTS daily_stats (
     id SERIAL PRIMARY KEY,
@@ -55,9 +56,13 @@ CREATE INDEX IF NOT EXISTS idx_daily_stats_user_date ON daily_stats(user_id, dat
 CREATE TABLE IF NOT EXISTS sessions (
     site_key TEXT PRIMARY KEY,
     token TEXT,
+    cookie TEXT,  -- Cloudflare cookies sent with the token
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Existing databases (the bot also adds it at startup):
+-- ALTER TABLE sessions ADD COLUMN IF NOT EXISTS cookie TEXT;
+
 -- Activity log
 CREATE TABLE IF NOT EXISTS activity_log (
     id SERIAL PRIMARY KEY,
@@ -71,6 +76,14 @@ CREATE TABLE IF NOT EXISTS activity_log (
 CREATE INDEX IF NOT EXISTS idx_activity_log_user ON activity_log(user_id);
 CREATE INDEX IF NOT EXISTS idx_activity_log_timestamp ON activity_log(timestamp);
 
+-- Admin panel counters: with ADMIN_SUMMARY=1 the bot's init_db creates an admin_summary
+-- row kept current by the admin_summary_users trigger on users, and rebuilds it at startup.
+-- Starting with ADMIN_SUMMARY off drops the trigger and function again; the table is left
+-- in place (rebuilt on the next opt-in). Remove everything by hand with:
+-- DROP TRIGGER IF EXISTS admin_summary_users ON users;
+-- DROP FUNCTION IF EXISTS admin_summary_apply();
+-- DROP TABLE IF EXISTS admin_summary;
+
 -- Success message
 SELECT 'Database setup completed successfully!' AS status;
 
@@ -12,15 +12,24 @@ import time
 import asyncio
 import hashlib
 import base64
-import sqlite3
 import logging
 import pytz
 import requests
 import schedule
 import threading
 import re
+import html
+import queue
+import copy
+import atexit
+import random
+import statistics
+import logging.handlers
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, time as dt_time
-from typing import Optional, Dict, List
+from typing import Optional, Dict, NamedTuple
 
 from telegram import Update, ReplyKeyboardMarkup, ReplyKeyboardRemove
 from telegram.ext import (
@@ -36,6 +45,12 @@ from telegram.constants import ParseMode
 from Crypto.Cipher import AES
 from Crypto.Util.Padding import pad, unpad
 
+# Optional native asyncio HTTP client (falls back to requests in the thread pool)
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
 # Disable SSL warnings
 import urllib3
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
@@ -72,17 +87,124 @@ PAYMENT_PER_NUMBER = 10  # Taka
 MAX_CONCURRENT_PER_USER = 3  # Maximum numbers a user can process simultaneously
 MAX_CONCURRENT_API_REQUESTS = 5  # Maximum concurrent OTP requests per site (API rate limit)
 
-# Database
-DB_PATH = "telegram_bot.db"
+# Keep-alive HTTP connection pools (per site)
+SITE_HTTP_POOL_SIZE = int(os.getenv("SITE_HTTP_POOL_SIZE", "20"))  # Connections per site
+SITE_HTTP_IDLE_TIMEOUT = int(os.getenv("SITE_HTTP_IDLE_TIMEOUT", "60"))  # Seconds with no request in flight before pooled connections are dropped
+
+# Link-confirmation polling (one shared schedule per site)
+STATUS_POLL_INTERVAL = float(os.getenv("STATUS_POLL_INTERVAL", "1"))  # Fast interval right after the OTP is sent
+STATUS_POLL_FAST_PERIOD = float(os.getenv("STATUS_POLL_FAST_PERIOD", "30"))  # Seconds of fast polling
+STATUS_POLL_STEP_PERIOD = float(os.getenv("STATUS_POLL_STEP_PERIOD", "15"))  # Slow down every N seconds after that
+STATUS_POLL_BACKOFF = float(os.getenv("STATUS_POLL_BACKOFF", "1.5"))  # Interval multiplier per step
+STATUS_POLL_MAX_INTERVAL = float(os.getenv("STATUS_POLL_MAX_INTERVAL", "5"))  # Interval cap
+STATUS_POLL_JITTER = float(os.getenv("STATUS_POLL_JITTER", "0.2"))  # +/- fraction of random jitter
+STATUS_POLL_MAX_RPS = float(os.getenv("STATUS_POLL_MAX_RPS", "50"))  # Global check_status budget (all sites)
+
+# Encrypted status/OTP request bodies cached per site (bounded LRU)
+PAYLOAD_CACHE_SIZE = int(os.getenv("PAYLOAD_CACHE_SIZE", "1024"))
+
+# Async HTTP connection pool (shared by all sites when aiohttp is installed)
+ASYNC_HTTP_POOL_SIZE = int(os.getenv("ASYNC_HTTP_POOL_SIZE", "200"))  # Total connections
+ASYNC_HTTP_POOL_PER_HOST = int(os.getenv("ASYNC_HTTP_POOL_PER_HOST", "50"))  # Connections per site
+
+# Session refresh
+SESSION_REFRESH_COOLDOWN = 5  # Seconds after a successful re-login during which refresh requests reuse it
+SITE_LOGIN_TIMEOUT = float(os.getenv("SITE_LOGIN_TIMEOUT", "30"))  # Max startup wait for the first site login
+SITE_LOGIN_RETRY_INTERVAL = 30  # Seconds between background login retries for sites that failed at startup
+SESSION_RENEW_MARGIN = int(os.getenv("SESSION_RENEW_MARGIN", "120"))  # Renew a token this many seconds before it expires
+SESSION_RENEW_CHECK_INTERVAL = 15  # Seconds between expiry checks of the renewal thread
+SESSION_MIN_LIFETIME = int(os.getenv("SESSION_MIN_LIFETIME", "300"))  # Floor for a token lifetime learned from observed expiries
+SESSION_RESTORE_MAX_AGE = int(os.getenv("SESSION_RESTORE_MAX_AGE", "1800"))  # Max age of a stored token without exp claim to reuse at startup
+
+# Thread pools for blocking calls
+SITE_EXECUTOR_WORKERS = int(os.getenv("SITE_EXECUTOR_WORKERS", "32"))  # Workers per site pool
+SITE_EXECUTOR_PER_SITE = os.getenv("SITE_EXECUTOR_PER_SITE", "0") == "1"  # One pool per site instead of a shared one
+DB_EXECUTOR_WORKERS = int(os.getenv("DB_EXECUTOR_WORKERS", "8"))
 
 # ==================== LOGGING ====================
 
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
-)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_JSON = os.getenv("LOG_JSON", "0") == "1"  # One JSON object per line (structured mode)
+LOG_STATUS_SAMPLE_SECONDS = float(os.getenv("LOG_STATUS_SAMPLE_SECONDS", "30"))  # Per-phone interval for poll logs
+
+class JsonLogFormatter(logging.Formatter):
+    """Structured log lines, including phone/site fields passed via extra="""
+    
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'logger': record.name,
+            'level': record.levelname,
+            'msg': record.getMessage()
+        }
+        for field in ('phone', 'site'):
+            if hasattr(record, field):
+                entry[field] = getattr(record, field)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class PhoneSampleFilter(logging.Filter):
+    """Let through at most one record per phone every `interval` seconds"""
+    
+    def __init__(self, interval: float):
+        super().__init__()
+        self.interval = interval
+        self._last = {}
+        self._lock = threading.Lock()
+    
+    def filter(self, record):
+        phone = getattr(record, 'phone', None)
+        if phone is None or self.interval <= 0:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last.get(phone, 0.0) < self.interval:
+                return False
+            self._last[phone] = now
+            if len(self._last) > 10000:
+                self._last = {k: v for k, v in self._last.items() if now - v < self.interval}
+        return True
+
+class LogQueueHandler(logging.handlers.QueueHandler):
+    """Queue records with their message rendered but the traceback kept apart (exc_text) for the formatter"""
+    
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+def setup_logging():
+    """Log through a queue so the event loop and worker threads never wait on log I/O"""
+    if LOG_JSON:
+        formatter = JsonLogFormatter()
+    else:
+        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(formatter)
+    
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.setLevel(LOG_LEVEL)
+    root.addHandler(LogQueueHandler(log_queue))
+    
+    listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+setup_logging()
 logger = logging.getLogger(__name__)
 
+# Per-poll details (full responses, every classification) - debug level, sampled per phone
+status_logger = logging.getLogger(f"{__name__}.status")
+status_logger.addFilter(PhoneSampleFilter(LOG_STATUS_SAMPLE_SECONDS))
+
 # ==================== ACTIVE TASKS TRACKING ====================
 
 # Track active processing tasks: {user_id: {phone: task}}
@@ -100,340 +222,266 @@ def get_site_semaphore(site_key: str) -> asyncio.Semaphore:
         site_semaphores[site_key] = asyncio.Semaphore(MAX_CONCURRENT_API_REQUESTS)
     return site_semaphores[site_key]
 
+# ==================== THREAD POOLS ====================
+
+class InstrumentedExecutor(ThreadPoolExecutor):
+    """ThreadPoolExecutor that tracks queue depth and time spent waiting for a worker"""
+    
+    def __init__(self, max_workers: int, name: str):
+        super().__init__(max_workers=max_workers, thread_name_prefix=name)
+        self.name = name
+        self.max_workers = max_workers
+        self._stats_lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+    
+    def submit(self, fn, *args, **kwargs):
+        submitted = time.monotonic()
+        with self._stats_lock:
+            self.queued += 1
+        
+        def run():
+            waited = time.monotonic() - submitted
+            with self._stats_lock:
+                self.queued -= 1
+                self.running += 1
+                self.wait_total += waited
+                self.wait_max = max(self.wait_max, waited)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._stats_lock:
+                    self.running -= 1
+                    self.completed += 1
+        
+        return super().submit(run)
+    
+    def stats(self) -> dict:
+        """Queue depth, busy workers and queue wait times"""
+        with self._stats_lock:
+            started = self.completed + self.running
+            return {
+                'workers': self.max_workers,
+                'queued': self.queued,
+                'running': self.running,
+                'completed': self.completed,
+                'avg_wait_ms': self.wait_total / started * 1000 if started else 0.0,
+                'max_wait_ms': self.wait_max * 1000
+            }
+
+# Blocking DB calls get their own pool so slow sites can't starve user lookups
+db_executor = InstrumentedExecutor(DB_EXECUTOR_WORKERS, 'db')
+site_executors: Dict[str, InstrumentedExecutor] = {}
+_site_executors_lock = threading.Lock()
+
+def get_site_executor(site_key: str) -> InstrumentedExecutor:
+    """Thread pool for blocking calls to a site (shared unless SITE_EXECUTOR_PER_SITE)"""
+    pool_key = site_key if SITE_EXECUTOR_PER_SITE else 'site'
+    with _site_executors_lock:
+        if pool_key not in site_executors:
+            site_executors[pool_key] = InstrumentedExecutor(SITE_EXECUTOR_WORKERS, f'site-{pool_key}' if SITE_EXECUTOR_PER_SITE else 'site')
+        return site_executors[pool_key]
+
+async def run_db(func, *args):
+    """Run a blocking database call on the DB thread pool"""
+    return await asyncio.get_running_loop().run_in_executor(db_executor, func, *args)
+
+async def run_site(site_key: str, func, *args):
+    """Run a blocking site call (HTTP, login) on the site thread pool"""
+    return await asyncio.get_running_loop().run_in_executor(get_site_executor(site_key), func, *args)
+
 # ==================== DATABASE ====================
 
-# Import database adapter (auto-detects SQLite or PostgreSQL)
-try:
-    from db_adapter import (
-        init_db, get_user, add_or_update_user, approve_user, reject_user,
-        update_user_stats, reset_daily_stats, get_daily_report, log_activity,
-        get_number_progress, init_number_progress, update_site_progress,
-        check_and_complete_number, get_incomplete_sites, reset_daily_number_progress
-    )
-    logger.info("Using database adapter (auto-detects SQLite/PostgreSQL)")
-except ImportError:
-    # Fallback to original SQLite implementation
-    logger.info("Using original SQLite implementation")
-    
-    def init_db():
-        """Initialize SQLite database"""
-        conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-        cursor = conn.cursor()
-        
-        # Users table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                user_id INTEGER PRIMARY KEY,
-                username TEXT,
-                first_name TEXT,
-                last_name TEXT,
-                approved INTEGER DEFAULT 0,
-                balance REAL DEFAULT 0,
-                total_numbers INTEGER DEFAULT 0,
-                daily_numbers INTEGER DEFAULT 0,
-                joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Number progress tracking table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS number_progress (
-                phone_number TEXT PRIMARY KEY,
-                user_id INTEGER,
-                site1_linked INTEGER DEFAULT 0,
-                site2_linked INTEGER DEFAULT 0,
-                site3_linked INTEGER DEFAULT 0,
-                site4_linked INTEGER DEFAULT 0,
-                completed INTEGER DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users(user_id)
-            )
-        ''')
-        
-        # Daily stats table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS daily_stats (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                date TEXT,
-                numbers_added INTEGER DEFAULT 0,
-                earnings REAL DEFAULT 0,
-                UNIQUE(user_id, date)
-            )
-        ''')
-        
-        # Sessions table (for site logins)
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS sessions (
-                site_key TEXT PRIMARY KEY,
-                token TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Activity log
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS activity_log (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                action TEXT,
-                details TEXT,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        conn.commit()
-        conn.close()
-        logger.info("Database initialized")
-
-def get_user(user_id: int) -> Optional[Dict]:
-    """Get user from database"""
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM users WHERE user_id = ?', (user_id,))
-    row = cursor.fetchone()
-    conn.close()
-    
-    if row:
-        return {
-            'user_id': row[0],
-            'username': row[1],
-            'first_name': row[2],
-            'last_name': row[3],
-            'approved': row[4],
-            'balance': row[5],
-            'total_numbers': row[6],
-            'daily_numbers': row[7],
-            'joined_at': row[8]
-        }
-    return None
-
-def add_or_update_user(user_id: int, username: str, first_name: str, last_name: str):
-    """Add or update user in database"""
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        INSERT OR REPLACE INTO users (user_id, username, first_name, last_name, approved)
-        VALUES (?, ?, ?, ?, COALESCE((SELECT approved FROM users WHERE user_id = ?), 0))
-    ''', (user_id, username, first_name, last_name, user_id))
-    
-    conn.commit()
-    conn.close()
-
-def approve_user(user_id: int):
-    """Approve user"""
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-    cursor = conn.cursor()
-    cursor.execute('UPDATE users SET approved = 1 WHERE user_id = ?', (user_id,))
-    conn.commit()
-    conn.close()
-
-def reject_user(user_id: int):
-    """Reject user"""
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-    cursor = conn.cursor()
-    cursor.execute('UPDATE users SET approved = -1 WHERE user_id = ?', (user_id,))
-    conn.commit()
-    conn.close()
-
-def update_user_stats(user_id: int, numbers_added: int = 0, earnings: float = 0):
-    """Update user statistics"""
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-    cursor = conn.cursor()
-    
-    # Update user totals
-    cursor.execute('''
-        UPDATE users 
-        SET total_numbers = total_numbers + ?,
-            daily_numbers = daily_numbers + ?,
-            balance = balance + ?
-        WHERE user_id = ?
-    ''', (numbers_added, numbers_added, earnings, user_id))
-    
-    # Update daily stats
-    today = datetime.now(BANGLADESH_TZ).strftime('%Y-%m-%d')
-    cursor.execute('''
-        INSERT INTO daily_stats (user_id, date, numbers_added, earnings)
-        VALUES (?, ?, ?, ?)
-        ON CONFLICT(user_id, date) DO UPDATE SET
-            numbers_added = numbers_added + ?,
-            earnings = earnings + ?
-    ''', (user_id, today, numbers_added, earnings, numbers_added, earnings))
-    
-    conn.commit()
-    conn.close()
-
-def reset_daily_stats():
-    """Reset daily statistics for all users"""
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-    cursor = conn.cursor()
-    cursor.execute('UPDATE users SET daily_numbers = 0')
-    conn.commit()
-    conn.close()
-    
-    # Also reset incomplete number progress
-    reset_daily_number_progress()
-    
-    logger.info("Daily stats reset completed")
-
-def get_daily_report() -> List[Dict]:
-    """Get daily report for all users"""
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-    cursor = conn.cursor()
-    
-    today = datetime.now(BANGLADESH_TZ).strftime('%Y-%m-%d')
-    cursor.execute('''
-        SELECT u.user_id, u.first_name, u.username, d.numbers_added, d.earnings
-        FROM users u
-        LEFT JOIN daily_stats d ON u.user_id = d.user_id AND d.date = ?
-        WHERE u.approved = 1 AND (d.numbers_added > 0 OR d.numbers_added IS NULL)
-        ORDER BY d.numbers_added DESC
-    ''', (today,))
-    
-    rows = cursor.fetchall()
-    conn.close()
-    
-    return [
-        {
-            'user_id': row[0],
-            'first_name': row[1],
-            'username': row[2],
-            'numbers_added': row[3] or 0,
-            'earnings': row[4] or 0
-        }
-        for row in rows
-    ]
-
-def log_activity(user_id: int, action: str, details: str = ""):
-    """Log user activity"""
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT INTO activity_log (user_id, action, details)
-        VALUES (?, ?, ?)
-    ''', (user_id, action, details))
-    conn.commit()
-    conn.close()
-
-# ==================== NUMBER PROGRESS TRACKING ====================
-
-def get_number_progress(phone: str):
-    """Get progress for a phone number"""
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM number_progress WHERE phone_number = ?', (phone,))
-    row = cursor.fetchone()
-    conn.close()
-    
-    if row:
-        return {
-            'phone_number': row['phone_number'],
-            'user_id': row['user_id'],
-            'site1_linked': bool(row['site1_linked']),
-            'site2_linked': bool(row['site2_linked']),
-            'site3_linked': bool(row['site3_linked']),
-            'site4_linked': bool(row['site4_linked']),
-            'completed': bool(row['completed']),
-            'created_at': row['created_at'],
-            'last_updated': row['last_updated']
-        }
-    return None
-
-def init_number_progress(phone: str, user_id: int):
-    """Initialize progress tracking for a new number"""
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-    cursor = conn.cursor()
-    
-    # Check if already exists
-    cursor.execute('SELECT phone_number FROM number_progress WHERE phone_number = ?', (phone,))
-    if cursor.fetchone():
-        conn.close()
-        return  # Already exists
-    
-    cursor.execute('''
-        INSERT INTO number_progress (phone_number, user_id)
-        VALUES (?, ?)
-    ''', (phone, user_id))
-    conn.commit()
-    conn.close()
-
-def update_site_progress(phone: str, site_index: int, linked: bool = True):
-    """Update progress for a specific site (1-4)"""
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-    cursor = conn.cursor()
-    
-    site_column = f'site{site_index}_linked'
-    cursor.execute(f'''
-        UPDATE number_progress
-        SET {site_column} = ?,
-            last_updated = CURRENT_TIMESTAMP
-        WHERE phone_number = ?
-    ''', (1 if linked else 0, phone))
-    conn.commit()
-    conn.close()
-
-def check_and_complete_number(phone: str):
-    """Check if all 4 sites are linked and mark as completed"""
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        SELECT site1_linked, site2_linked, site3_linked, site4_linked
-        FROM number_progress
-        WHERE phone_number = ?
-    ''', (phone,))
-    
-    row = cursor.fetchone()
-    if row and all(row):
-        # All 4 sites linked - mark as completed
-        cursor.execute('''
-            UPDATE number_progress
-            SET completed = 1,
-                last_updated = CURRENT_TIMESTAMP
-            WHERE phone_number = ?
-        ''', (phone,))
-        conn.commit()
-        conn.close()
-        return True
-    conn.close()
-    return False
-
-def get_incomplete_sites(phone: str) -> list:
-    """Get list of site indices (1-4) that are not yet linked"""
-    progress = get_number_progress(phone)
-    if not progress:
-        return [1, 2, 3, 4]  # All sites need to be done
-    
-    incomplete = []
-    for i in range(1, 5):
-        if not progress[f'site{i}_linked']:
-            incomplete.append(i)
-    
-    return incomplete
-
-def reset_daily_number_progress():
-    """Reset all incomplete number progress daily"""
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-    cursor = conn.cursor()
-    cursor.execute('DELETE FROM number_progress WHERE completed = 0')
-    deleted_count = cursor.rowcount
-    conn.commit()
-    conn.close()
-    logger.info(f"Deleted {deleted_count} incomplete number progress records")
+from number_progress import NumberProgress
+NumberProgress.site_count = len(SITES)
+
+# Database adapter (auto-detects SQLite or PostgreSQL) - every statement comes from queries.STATEMENTS
+from db_adapter import (
+    init_db, reset_daily_stats, save_session, load_sessions,
+    activity_log_buffer, user_cache, get_statement_stats, pool_gauges, close_pool
+)
+import async_db as db_async
+db_async.set_executor(db_executor)
+
+# ==================== STATUS RESPONSE CLASSIFIER ====================
+
+class StatusResult(NamedTuple):
+    """Classified login/status response"""
+    success: bool
+    waiting: bool
+    code: Optional[int]
+    msg: str
+
+# 20003 = login success, 20002 = has been bound (linked), 200/0/1 = general success
+STATUS_SUCCESS_CODES = frozenset({20003, 20002, 200, 0, 1})
+STATUS_WAITING_CODE = 20001
+STATUS_NO_RESPONSE = StatusResult(False, True, None, 'No response')
+
+_PHONE_IN_MSG_RE = re.compile(r'\d{10,15}')
+_PHONE_STRIP_TABLE = str.maketrans('', '', '+- ')
+
+def _phone_mismatch(phone: str, msg) -> Optional[str]:
+    """Number quoted in a status message, if it is not `phone`"""
+    if not msg:
+        return None
+    text = str(msg)
+    if 'number' not in text.lower():
+        return None
+    match = _PHONE_IN_MSG_RE.search(text)
+    if match is None:
+        return None
+    phone_clean = phone.translate(_PHONE_STRIP_TABLE)
+    return match.group() if match.group() != phone_clean else None
+
+def classify_status_response(phone: str, result: dict, decrypt) -> StatusResult:
+    """Decode a login/status response once and classify it"""
+    # Simple status=1 success format - only rejected on explicit phone mismatch
+    if result.get('status') == 1:
+        msg = result.get('msg', 'Success')
+        if _phone_mismatch(phone, msg):
+            logger.warning("Status=1 phone mismatch for %s: %s. Ignoring.", phone, msg, extra={'phone': phone})
+            return StatusResult(False, True, 1, msg)
+        return StatusResult(True, False, 1, msg)
+    
+    # Code at top level (new API format), else in data (old format, dict or encrypted string)
+    if 'code' in result:
+        body = result
+    else:
+        data = result.get('data')
+        if isinstance(data, dict) and data:
+            body = data
+        elif isinstance(data, str):
+            try:
+                body = json.loads(decrypt(data))
+                if not isinstance(body, dict):
+                    raise ValueError(f"Unexpected decrypted payload: {body!r}")
+            except Exception as e:
+                logger.error("Decrypt error in check_status: %s", e)
+                return StatusResult(False, True, None, str(e))
+        else:
+            logger.warning("Unexpected response format: %s", result)
+            return STATUS_NO_RESPONSE
+    
+    code = body.get('code')
+    msg = body.get('msg', '')
+    
+    other_phone = _phone_mismatch(phone, msg)
+    if other_phone:
+        phone_clean = phone.translate(_PHONE_STRIP_TABLE)
+        logger.warning("Phone mismatch: expected %s, got %s. Ignoring.", phone_clean, other_phone,
+                       extra={'phone': phone})
+        return StatusResult(False, True, code, f'Phone mismatch: {phone_clean} != {other_phone}')
+    
+    msg_lower = str(msg).lower() if msg else ''
+    is_success = code in STATUS_SUCCESS_CODES or 'success' in msg_lower or 'has been bound' in msg_lower
+    return StatusResult(is_success, code == STATUS_WAITING_CODE, code, msg)
 
 # ==================== WHATSAPP OTP SITE CLASS ====================
 
+class SiteHTTPPool:
+    """Long-lived keep-alive connection pool for one site (thread-safe)"""
+    
+    def __init__(self, pool_size: int = None, idle_timeout: int = None):
+        self.pool_size = pool_size or SITE_HTTP_POOL_SIZE
+        self.idle_timeout = idle_timeout or SITE_HTTP_IDLE_TIMEOUT
+        self._session = None
+        self._lock = threading.Lock()
+        self._last_used = 0.0  # Monotonic time of the last release
+        self._in_use = 0  # Borrowers between use() and release
+        self._close_pending = False
+        # Counters carried over from sessions dropped after idling
+        self._retired_opened = 0
+        self._retired_requests = 0
+    
+    @contextmanager
+    def use(self):
+        """Borrow the pooled session for a request; it is recreated only after idling with no borrowers"""
+        with self._lock:
+            if (self._session is not None and not self._in_use
+                    and time.monotonic() - self._last_used > self.idle_timeout):
+                self._retire_session()
+            if self._session is None:
+                session = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(
+                    pool_connections=1,
+                    pool_maxsize=self.pool_size,
+                    pool_block=True
+                )
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                self._session = session
+            session = self._session
+            self._in_use += 1
+        try:
+            yield session
+        finally:
+            with self._lock:
+                self._in_use -= 1
+                self._last_used = time.monotonic()
+                if self._close_pending and not self._in_use and self._session is session:
+                    self._close_pending = False
+                    self._retire_session()
+    
+    def _connection_pools(self):
+        """urllib3 pools of the current session (caller holds the lock)"""
+        if self._session is None:
+            return []
+        pools = []
+        for adapter in set(self._session.adapters.values()):
+            pool_manager = adapter.poolmanager
+            for key in list(pool_manager.pools.keys()):
+                pool = pool_manager.pools.get(key)
+                if pool is not None:
+                    pools.append(pool)
+        return pools
+    
+    def _retire_session(self):
+        """Close current session, keeping its counters (caller holds the lock)"""
+        for pool in self._connection_pools():
+            self._retired_opened += pool.num_connections
+            self._retired_requests += pool.num_requests
+        self._session.close()
+        self._session = None
+    
+    def stats(self) -> dict:
+        """Connections opened vs reused since startup"""
+        with self._lock:
+            opened = self._retired_opened
+            requests_sent = self._retired_requests
+            for pool in self._connection_pools():
+                opened += pool.num_connections
+                requests_sent += pool.num_requests
+        return {'opened': opened, 'reused': max(requests_sent - opened, 0), 'requests': requests_sent}
+    
+    def close(self):
+        """Close all pooled connections (deferred to the last release while requests are in flight)"""
+        with self._lock:
+            if self._session is None:
+                return
+            if self._in_use:
+                self._close_pending = True
+            else:
+                self._retire_session()
+
+class SessionExpired(Exception):
+    """Site rejected the session token (HTTP 401/403) - refresh it through global_session_manager"""
+
 class WhatsAppOTPSite:
     """Handle WhatsApp OTP for a single site"""
     
-    def __init__(self, base_url: str, username: str, password: str):
+    def __init__(self, base_url: str, username: str, password: str, http_pool: SiteHTTPPool = None):
         self.base_url = base_url.rstrip('/')
         self.username = username
         self.password = password
+        # Encrypted request bodies keyed by (token, endpoint, phone) - see _phone_payload
+        self._payload_cache = OrderedDict()
+        self._payload_lock = threading.Lock()
         self.token = None
+        # Keep-alive connections reused by every endpoint (shared across re-logins)
+        self.http = http_pool or SiteHTTPPool()
         # Enhanced headers to bypass Cloudflare protection
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
@@ -452,20 +500,58 @@ class WhatsAppOTPSite:
         }
         self.is_logged_in = False
     
+    @property
+    def token(self):
+        """Session JWT"""
+        return self._token
+    
+    @token.setter
+    def token(self, value):
+        """Set session JWT and drop the key/IV and payloads derived from the old one"""
+        self._token = value
+        self._claims = None
+        self._key_iv = None
+        with self._payload_lock:
+            self._payload_cache.clear()
+    
     def _get_key_iv(self):
-        """Get encryption key and IV from JWT token"""
-        if not self.token:
+        """Get encryption key and IV from JWT token (decoded once per token)"""
+        if self._key_iv is not None:
+            return self._key_iv
+        
+        token = self._token
+        session_id = self._token_claims(token)['sessionId'].replace('-', '')
+        
+        key_iv = (session_id[:16].encode('utf-8'), session_id[-16:].encode('utf-8'))
+        # Only cache if the token was not swapped while decoding
+        if token is self._token:
+            self._key_iv = key_iv
+        return key_iv
+    
+    def _token_claims(self, token: str = None) -> dict:
+        """Decoded JWT payload (decoded once per token)"""
+        token = token or self._token
+        if not token:
             raise ValueError("No token")
         
-        parts = self.token.split('.')
-        payload = parts[1] + '=' * (4 - len(parts[1]) % 4)
-        decoded = base64.b64decode(payload)
-        payload_data = json.loads(decoded)
-        session_id = payload_data['sessionId'].replace('-', '')
+        cached = self._claims
+        if cached is not None and cached[0] is token:
+            return cached[1]
         
-        key = session_id[:16]
-        iv = session_id[-16:]
-        return key, iv
+        parts = token.split('.')
+        payload = parts[1] + '=' * (4 - len(parts[1]) % 4)
+        claims = json.loads(base64.urlsafe_b64decode(payload))
+        if token is self._token:
+            self._claims = (token, claims)
+        return claims
+    
+    def token_expires_at(self) -> Optional[float]:
+        """Token expiry (epoch seconds) from the JWT exp claim, None if absent"""
+        try:
+            exp = self._token_claims().get('exp')
+            return float(exp) if exp is not None else None
+        except (ValueError, TypeError, KeyError, IndexError):
+            return None
     
     def _encrypt(self, data):
         """Encrypt data using AES-CBC (hex encoded)"""
@@ -474,16 +560,33 @@ class WhatsAppOTPSite:
         if isinstance(data, dict):
             data = json.dumps(data, separators=(',', ':'))
         
-        cipher = AES.new(key.encode('utf-8'), AES.MODE_CBC, iv.encode('utf-8'))
+        cipher = AES.new(key, AES.MODE_CBC, iv)
         padded = pad(data.encode('utf-8'), AES.block_size)
         encrypted = cipher.encrypt(padded)
         return encrypted.hex()
     
+    def _phone_payload(self, endpoint: str, phone: str) -> str:
+        """Encrypted {"phone_number": phone} body, cached per (token, endpoint, phone)"""
+        cache_key = (self._token, endpoint, phone)
+        with self._payload_lock:
+            encrypted = self._payload_cache.get(cache_key)
+            if encrypted is not None:
+                self._payload_cache.move_to_end(cache_key)
+                return encrypted
+        
+        encrypted = self._encrypt({"phone_number": phone})
+        
+        with self._payload_lock:
+            self._payload_cache[cache_key] = encrypted
+            while len(self._payload_cache) > PAYLOAD_CACHE_SIZE:
+                self._payload_cache.popitem(last=False)
+        return encrypted
+    
     def _decrypt(self, encrypted_hex):
         """Decrypt AES-CBC encrypted data (hex encoded)"""
         key, iv = self._get_key_iv()
         encrypted_bytes = bytes.fromhex(encrypted_hex)
-        cipher = AES.new(key.encode('utf-8'), AES.MODE_CBC, iv.encode('utf-8'))
+        cipher = AES.new(key, AES.MODE_CBC, iv)
         decrypted = cipher.decrypt(encrypted_bytes)
         unpadded = unpad(decrypted, AES.block_size)
         return unpadded.decode('utf-8')
@@ -493,137 +596,171 @@ class WhatsAppOTPSite:
         try:
             password_hash = hashlib.md5(self.password.encode()).hexdigest()
             
-            # Create session to handle cookies (helps with Cloudflare)
-            session = requests.Session()
-            session.headers.update(self.headers)
-            
-            # First, visit the base URL to get Cloudflare cookies if needed
-            # This mimics a real browser visit
-            try:
-                pre_response = session.get(
-                    self.base_url, 
-                    timeout=10, 
-                    verify=False, 
-                    allow_redirects=True
-                )
-                # Wait a bit to let Cloudflare process (if challenge page)
-                if 'Just a moment' in pre_response.text or 'challenge' in pre_response.text.lower():
-                    logger.warning(f"Cloudflare challenge detected for {self.base_url}, waiting...")
-                    time.sleep(3)  # Wait for Cloudflare to process
-                    # Try again
+            # Pooled session handles cookies (helps with Cloudflare) - borrowed for the whole login
+            with self.http.use() as session:
+                # First, visit the base URL to get Cloudflare cookies if needed
+                # This mimics a real browser visit
+                try:
                     pre_response = session.get(
                         self.base_url, 
+                        headers=self.headers,
                         timeout=10, 
                         verify=False, 
                         allow_redirects=True
                     )
-            except Exception as e:
-                logger.warning(f"Pre-visit failed for {self.base_url}: {e}")
-            
-            # Build cookie string from session
-            cookie_str = '; '.join([f"{c.name}={c.value}" for c in session.cookies])
-            if cookie_str:
-                self.headers['Cookie'] = cookie_str
-            
-            response = session.post(
-                f"{self.base_url}/pl3/access/login",
-                json={
-                    'reg_type': 1,
-                    'phone': self.username,
-                    'password': password_hash
-                },
-                timeout=15,
-                verify=False
-            )
-            
-            # Update cookies from response
-            if session.cookies:
+                    # Wait a bit to let Cloudflare process (if challenge page)
+                    if 'Just a moment' in pre_response.text or 'challenge' in pre_response.text.lower():
+                        logger.warning("Cloudflare challenge detected for %s, waiting...", self.base_url)
+                        time.sleep(3)  # Wait for Cloudflare to process
+                        # Try again
+                        pre_response = session.get(
+                            self.base_url, 
+                            headers=self.headers,
+                            timeout=10, 
+                            verify=False, 
+                            allow_redirects=True
+                        )
+                except Exception as e:
+                    logger.warning("Pre-visit failed for %s: %s", self.base_url, e)
+                
+                # Build cookie string from session
                 cookie_str = '; '.join([f"{c.name}={c.value}" for c in session.cookies])
                 if cookie_str:
                     self.headers['Cookie'] = cookie_str
-            
-            if response.status_code == 200:
-                result = response.json()
-                if result.get('code') == 0 and 'data' in result:
-                    self.token = result['data'].get('token')
-                    
-                    if self.token:
-                        self.headers['Authorization'] = f'Bearer {self.token}'
-                        self.is_logged_in = True
-                        logger.info(f"Successfully logged in to {self.base_url}")
-                        return True
-                else:
-                    logger.error(f"Login failed for {self.base_url}: code={result.get('code')}, msg={result.get('msg', 'Unknown')}")
-            elif response.status_code == 403:
-                # Cloudflare protection detected
-                if 'Just a moment' in response.text or 'challenge' in response.text.lower():
-                    logger.error(f"Login failed for {self.base_url}: Cloudflare protection detected (HTTP 403). Site may be blocking automated requests.")
-                else:
-                    logger.error(f"Login failed for {self.base_url}: HTTP 403, response={response.text[:200]}")
-            else:
-                logger.error(f"Login failed for {self.base_url}: HTTP {response.status_code}, response={response.text[:200]}")
-            
-            return False
-            
+                
+                response = session.post(
+                    f"{self.base_url}/pl3/access/login",
+                    json={
+                        'reg_type': 1,
+                        'phone': self.username,
+                        'password': password_hash
+                    },
+                    headers=self.headers,
+                    timeout=15,
+                    verify=False
+                )
+                
+                # Update cookies from response
+                if session.cookies:
+                    cookie_str = '; '.join([f"{c.name}={c.value}" for c in session.cookies])
+                    if cookie_str:
+                        self.headers['Cookie'] = cookie_str
+                
+                return self._handle_login_response(response.status_code, response.text)
+        
         except requests.exceptions.RequestException as e:
-            logger.error(f"Login network error for {self.base_url}: {type(e).__name__}: {e}")
+            logger.error("Login network error for %s: %s: %s", self.base_url, type(e).__name__, e)
             return False
         except Exception as e:
-            logger.error(f"Login error for {self.base_url}: {type(e).__name__}: {e}")
+            logger.error("Login error for %s: %s: %s", self.base_url, type(e).__name__, e)
+            return False
+    
+    def _handle_login_response(self, status_code: int, text: str) -> bool:
+        """Store token from login API response (shared by sync and async login)"""
+        if status_code == 200:
+            result = json.loads(text)
+            if result.get('code') == 0 and 'data' in result:
+                self.token = result['data'].get('token')
+                
+                if self.token:
+                    self.headers['Authorization'] = f'Bearer {self.token}'
+                    self.is_logged_in = True
+                    logger.info("Successfully logged in to %s", self.base_url)
+                    return True
+            else:
+                logger.error("Login failed for %s: code=%s, msg=%s", self.base_url, result.get('code'), result.get('msg', 'Unknown'))
+        elif status_code == 403:
+            # Cloudflare protection detected
+            if 'Just a moment' in text or 'challenge' in text.lower():
+                logger.error("Login failed for %s: Cloudflare protection detected (HTTP 403). Site may be blocking automated requests.", self.base_url)
+            else:
+                logger.error("Login failed for %s: HTTP 403, response=%s", self.base_url, text[:200])
+        else:
+            logger.error("Login failed for %s: HTTP %s, response=%s", self.base_url, status_code, text[:200])
+        
+        return False
+    
+    def restore_token(self, token: str, cookie: str = '') -> bool:
+        """Reuse a stored session token and its cookies (no network call) - False if it cannot be decoded"""
+        try:
+            self.token = token
+            self._get_key_iv()
+        except (ValueError, KeyError, IndexError, TypeError):
+            self.token = None
             return False
+        self.headers['Authorization'] = f'Bearer {self.token}'
+        if cookie:
+            self.headers['Cookie'] = cookie
+        self.is_logged_in = True
+        return True
+    
+    def validate_session(self) -> bool:
+        """One cheap authenticated request (link status of the account number) - False if the token is rejected"""
+        try:
+            with self.http.use() as session:
+                response = session.post(
+                    f"{self.base_url}/pl3/2/ws/login/status",
+                    json={'data': self._phone_payload("/pl3/2/ws/login/status", self.username)},
+                    headers=self.headers,
+                    timeout=10,
+                    verify=False
+                )
+            if response.status_code != 200:
+                logger.info("Stored session rejected by %s: HTTP %s", self.base_url, response.status_code)
+                return False
+            status = classify_status_response(self.username, response.json(), self._decrypt)
+        except Exception as e:
+            logger.warning("Stored session check failed for %s: %s", self.base_url, e)
+            return False
+        if status.code == 10002:
+            logger.info("Stored session expired on %s", self.base_url)
+            return False
+        return True
+    
+    def _extract_login_code(self, result: dict) -> Optional[str]:
+        """Decrypt login_code/get response - None means retry"""
+        if 'data' not in result:
+            return None
+        
+        try:
+            decrypted = self._decrypt(result['data'])
+            response_data = json.loads(decrypted)
+        except Exception:
+            return None
+        
+        if response_data.get('code') == 0 and 'data' in response_data:
+            return response_data['data'].get('login_code', '')
+        return None
     
     def get_otp(self, phone: str, retry: int = 3) -> Optional[str]:
         """Get OTP for phone number"""
-        payload = {"phone_number": phone}
-        
         for attempt in range(retry):
             try:
-                encrypted_payload = self._encrypt(payload)
+                encrypted_payload = self._phone_payload("/pl3/2/ws/login_code/get", phone)
                 
-                response = requests.post(
-                    f"{self.base_url}/pl3/2/ws/login_code/get",
-                    json={'data': encrypted_payload},
-                    headers=self.headers,
-                    timeout=20,
-                    verify=False
-                )
+                with self.http.use() as session:
+                    response = session.post(
+                        f"{self.base_url}/pl3/2/ws/login_code/get",
+                        json={'data': encrypted_payload},
+                        headers=self.headers,
+                        timeout=20,
+                        verify=False
+                    )
                 
                 if response.status_code == 200:
-                    result = response.json()
+                    login_code = self._extract_login_code(response.json())
+                    if login_code is not None:
+                        return login_code
                     
-                    if 'data' not in result:
-                        if attempt < retry - 1:
-                            # Reduced sleep from 2s to 0.5s
-                            time.sleep(0.5)
-                            continue
-                        return None
-                    
-                    try:
-                        decrypted = self._decrypt(result['data'])
-                        response_data = json.loads(decrypted)
-                        
-                        if response_data.get('code') == 0 and 'data' in response_data:
-                            return response_data['data'].get('login_code', '')
-                        else:
-                            if attempt < retry - 1:
-                                # Reduced sleep from 3s to 0.5s
-                                time.sleep(0.5)
-                                continue
-                            return None
-                            
-                    except Exception:
-                        if attempt < retry - 1:
-                            # Reduced sleep from 2s to 0.5s
-                            time.sleep(0.5)
-                            continue
-                        return None
-                        
-                elif response.status_code in [401, 403]:
-                    # Session expired - re-login
-                    if self.login():
-                        if attempt < retry - 1:
-                            continue
+                    if attempt < retry - 1:
+                        # Reduced sleep from 2s to 0.5s
+                        time.sleep(0.5)
+                        continue
                     return None
+                
+                elif response.status_code in [401, 403]:
+                    # Session expired - the caller refreshes it once for the whole site
+                    raise SessionExpired(f"HTTP {response.status_code}")
                 else:
                     if attempt < retry - 1:
                         # Reduced sleep from 2s to 0.5s
@@ -637,8 +774,10 @@ class WhatsAppOTPSite:
                     time.sleep(0.5)
                     continue
                 return None
+            except SessionExpired:
+                raise
             except Exception as e:
-                logger.error(f"OTP error: {e}")
+                logger.error("OTP error: %s", e)
                 if attempt < retry - 1:
                     # Reduced sleep from 2s to 0.5s
                     time.sleep(0.5)
@@ -656,205 +795,279 @@ class WhatsAppOTPSite:
             }
             encrypted_payload = self._encrypt(payload)
             
-            response = requests.post(
-                f"{self.base_url}/pl3/activity/reset",
-                json={'data': encrypted_payload},
-                headers=self.headers,
-                timeout=15,
-                verify=False
-            )
+            with self.http.use() as session:
+                response = session.post(
+                    f"{self.base_url}/pl3/activity/reset",
+                    json={'data': encrypted_payload},
+                    headers=self.headers,
+                    timeout=15,
+                    verify=False
+                )
             
             if response.status_code == 200:
-                result = response.json()
-                
-                # Decrypt response
-                if 'data' in result and isinstance(result['data'], str):
-                    try:
-                        decrypted = self._decrypt(result['data'])
-                        data = json.loads(decrypted)
-                        
-                        # code=0 means success, code=10000 means not ready yet
-                        if data.get('code') == 0:
-                            return {'success': True, 'msg': 'Reward claimed'}
-                        elif data.get('code') == 10000:
-                            return {'success': False, 'msg': 'Not ready yet'}
-                        else:
-                            return {'success': False, 'msg': data.get('msg', 'Unknown')}
-                    except Exception as e:
-                        return {'success': False, 'msg': f'Decrypt error: {e}'}
-                
-                return {'success': False, 'msg': 'Invalid response format'}
+                return self._parse_reward_response(response.json())
             else:
                 return {'success': False, 'msg': f'HTTP {response.status_code}'}
         except Exception as e:
             return {'success': False, 'msg': str(e)}
     
-    def check_status(self, phone: str) -> dict:
-        """Check WhatsApp linking status - returns dict with status info"""
+    def _parse_reward_response(self, result: dict) -> dict:
+        """Decrypt activity/reset response"""
+        if 'data' in result and isinstance(result['data'], str):
+            try:
+                decrypted = self._decrypt(result['data'])
+                data = json.loads(decrypted)
+                
+                # code=0 means success, code=10000 means not ready yet
+                if data.get('code') == 0:
+                    return {'success': True, 'msg': 'Reward claimed'}
+                elif data.get('code') == 10000:
+                    return {'success': False, 'msg': 'Not ready yet'}
+                else:
+                    return {'success': False, 'msg': data.get('msg', 'Unknown')}
+            except Exception as e:
+                return {'success': False, 'msg': f'Decrypt error: {e}'}
+        
+        return {'success': False, 'msg': 'Invalid response format'}
+    
+    def check_status(self, phone: str) -> StatusResult:
+        """Check WhatsApp linking status"""
         try:
-            payload = {"phone_number": phone}
-            encrypted_payload = self._encrypt(payload)
+            encrypted_payload = self._phone_payload("/pl3/2/ws/login/status", phone)
             
-            response = requests.post(
-                f"{self.base_url}/pl3/2/ws/login/status",
-                json={'data': encrypted_payload},
-                headers=self.headers,
-                timeout=10,
-                verify=False
-            )
+            with self.http.use() as session:
+                response = session.post(
+                    f"{self.base_url}/pl3/2/ws/login/status",
+                    json={'data': encrypted_payload},
+                    headers=self.headers,
+                    timeout=10,
+                    verify=False
+                )
             
             if response.status_code == 200:
-                result = response.json()
-                
-                # Log full API response for debugging
-                logger.info(f"📥 Full status API response for {phone}: {result}")
+                return self._parse_status_response(phone, response.json())
+            else:
+                logger.warning("Status check HTTP %s", response.status_code)
+            
+            return STATUS_NO_RESPONSE
+        except Exception as e:
+            logger.error("Status check error: %s", e)
+            return StatusResult(False, True, None, str(e))
+    
+    def _parse_status_response(self, phone: str, result: dict) -> StatusResult:
+        """Interpret login/status API response (shared by sync and async check_status)"""
+        status = classify_status_response(phone, result, self._decrypt)
+        
+        # Full API response on the sampled debug channel
+        if status_logger.isEnabledFor(logging.DEBUG):
+            status_logger.debug("status phone=%s code=%s success=%s msg=%s response=%s",
+                                phone, status.code, status.success, status.msg, result,
+                                extra={'phone': phone, 'site': self.base_url})
+        return status
+
+# ==================== ASYNC HTTP CLIENT ====================
+
+# Shared aiohttp session (one connection pool for all sites, bound to the bot's event loop)
+_async_http_session = None
+
+# Connection counters for the shared pool (opened vs reused keep-alive connections)
+async_http_stats = {'opened': 0, 'reused': 0}
+
+async def _on_connection_create_end(session, context, params):
+    async_http_stats['opened'] += 1
+
+async def _on_connection_reuseconn(session, context, params):
+    async_http_stats['reused'] += 1
+
+def _async_trace_config():
+    """Trace hooks feeding async_http_stats"""
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_connection_create_end.append(_on_connection_create_end)
+    trace_config.on_connection_reuseconn.append(_on_connection_reuseconn)
+    return trace_config
+
+async def get_async_http_session():
+    """Get or create the shared aiohttp session"""
+    global _async_http_session
+    if _async_http_session is None or _async_http_session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=ASYNC_HTTP_POOL_SIZE,
+            limit_per_host=ASYNC_HTTP_POOL_PER_HOST,
+            keepalive_timeout=SITE_HTTP_IDLE_TIMEOUT,
+            ssl=False
+        )
+        # Cookies are sent explicitly per site via headers['Cookie']
+        _async_http_session = aiohttp.ClientSession(
+            connector=connector,
+            cookie_jar=aiohttp.DummyCookieJar(),
+            trace_configs=[_async_trace_config()]
+        )
+    return _async_http_session
+
+async def close_async_http_session():
+    """Close the shared aiohttp session (on shutdown)"""
+    global _async_http_session
+    if _async_http_session is not None and not _async_http_session.closed:
+        await _async_http_session.close()
+    _async_http_session = None
+
+class AsyncWhatsAppOTPSite(WhatsAppOTPSite):
+    """WhatsAppOTPSite with awaitable endpoints on the shared aiohttp pool"""
+    
+    async def _post_async(self, path: str, encrypted_payload: str, timeout: int):
+        """POST encrypted payload, returns (status_code, json or None)"""
+        http = await get_async_http_session()
+        async with http.post(
+            f"{self.base_url}{path}",
+            json={'data': encrypted_payload},
+            headers=self.headers,
+            timeout=aiohttp.ClientTimeout(total=timeout)
+        ) as response:
+            if response.status != 200:
+                return response.status, None
+            return response.status, await response.json(content_type=None)
+    
+    async def login_async(self) -> bool:
+        """Login and save session token (async)"""
+        try:
+            password_hash = hashlib.md5(self.password.encode()).hexdigest()
+            http = await get_async_http_session()
+            
+            # Own cookie jar for Cloudflare cookies, connections come from the shared pool
+            async with aiohttp.ClientSession(
+                connector=http.connector,
+                connector_owner=False,
+                cookie_jar=aiohttp.CookieJar(unsafe=True),
+                headers=self.headers,
+                trace_configs=[_async_trace_config()]
+            ) as session:
+                # First, visit the base URL to get Cloudflare cookies if needed
+                try:
+                    async with session.get(self.base_url, timeout=aiohttp.ClientTimeout(total=10)) as pre_response:
+                        pre_text = await pre_response.text()
+                    if 'Just a moment' in pre_text or 'challenge' in pre_text.lower():
+                        logger.warning("Cloudflare challenge detected for %s, waiting...", self.base_url)
+                        await asyncio.sleep(3)
+                        async with session.get(self.base_url, timeout=aiohttp.ClientTimeout(total=10)) as pre_response:
+                            await pre_response.read()
+                except Exception as e:
+                    logger.warning("Pre-visit failed for %s: %s", self.base_url, e)
                 
-                # Check for simple status=1 success format
-                if 'status' in result and result.get('status') == 1:
-                    msg = result.get('msg', 'Success')
-                    phone_clean = phone.replace('+', '').replace('-', '').replace(' ', '')
-                    
-                    # ONLY reject if there's explicit phone mismatch
-                    if msg and 'number' in str(msg).lower():
-                        numbers_in_msg = re.findall(r'\d{10,15}', str(msg))
-                        if numbers_in_msg and numbers_in_msg[0] != phone_clean:
-                            logger.warning(f"⚠️ Status=1 phone mismatch! Expected {phone_clean}, got {numbers_in_msg[0]}. Ignoring.")
-                            return {
-                                'success': False,
-                                'waiting': True,
-                                'code': 1,
-                                'msg': msg
-                            }
-                    
-                    # Accept all other status=1 responses
-                    logger.info(f"✅ Status check (status=1): SUCCESS for {phone}")
-                    return {
-                        'success': True,
-                        'waiting': False,
-                        'code': 1,
-                        'msg': msg
-                    }
+                cookie_str = '; '.join([f"{c.key}={c.value}" for c in session.cookie_jar])
+                if cookie_str:
+                    self.headers['Cookie'] = cookie_str
                 
-                # Check if code is at top level (new API format)
-                if 'code' in result:
-                    code = result.get('code')
-                    msg = result.get('msg', '')
-                    phone_clean = phone.replace('+', '').replace('-', '').replace(' ', '')
-                    
-                    # ONLY reject if there's explicit phone mismatch
-                    if msg and 'number' in msg.lower():
-                        numbers_in_msg = re.findall(r'\d{10,15}', msg)
-                        if numbers_in_msg and numbers_in_msg[0] != phone_clean:
-                            logger.warning(f"⚠️ PHONE MISMATCH! Expected {phone_clean}, got {numbers_in_msg[0]}. Ignoring.")
-                            return {
-                                'success': False,
-                                'waiting': True,
-                                'code': code,
-                                'msg': f'Phone mismatch: {phone_clean} != {numbers_in_msg[0]}'
-                            }
-                    
-                    # Multiple success codes possible
-                    # 20003 = login success
-                    # 20002 = has been bound (successfully linked!)
-                    # 200, 0 = general success
-                    # 1 = success (some APIs use this)
-                    is_success = code in [20003, 20002, 200, 0, 1]
-                    
-                    # Check message for success indicators
-                    if msg and ('success' in msg.lower() or 'login success' in msg.lower() or 'has been bound' in msg.lower()):
-                        is_success = True
-                    
-                    logger.info(f"🔍 Status check (top-level): code={code}, msg={msg}, is_success={is_success}")
-                    
-                    return {
-                        'success': is_success,
-                        'waiting': code == 20001,  # 20001 = waiting
-                        'code': code,
-                        'msg': msg
-                    }
+                async with session.post(
+                    f"{self.base_url}/pl3/access/login",
+                    json={
+                        'reg_type': 1,
+                        'phone': self.username,
+                        'password': password_hash
+                    },
+                    headers=self.headers,
+                    timeout=aiohttp.ClientTimeout(total=15)
+                ) as response:
+                    status_code = response.status
+                    text = await response.text()
                 
-                # Check if data is present (old API format)
-                if 'data' in result:
-                    data = result['data']
-                    
-                    # If data is already a dict, use it directly
-                    if isinstance(data, dict) and data:  # Make sure it's not empty
-                        code = data.get('code')
-                        msg = data.get('msg', '')
-                        phone_clean = phone.replace('+', '').replace('-', '').replace(' ', '')
-                        
-                        # ONLY reject if there's explicit phone mismatch
-                        if msg and 'number' in msg.lower():
-                            numbers_in_msg = re.findall(r'\d{10,15}', msg)
-                            if numbers_in_msg and numbers_in_msg[0] != phone_clean:
-                                logger.warning(f"⚠️ PHONE MISMATCH! Expected {phone_clean}, got {numbers_in_msg[0]}. Ignoring.")
-                                return {
-                                    'success': False,
-                                    'waiting': True,
-                                    'code': code,
-                                    'msg': f'Phone mismatch: {phone_clean} != {numbers_in_msg[0]}'
-                                }
-                        
-                        # Multiple success codes possible
-                        is_success = code in [20003, 20002, 200, 0, 1]
-                        if msg and ('success' in msg.lower() or 'login success' in msg.lower() or 'has been bound' in msg.lower()):
-                            is_success = True
-                        
-                        logger.info(f"🔍 Status check (data dict): code={code}, msg={msg}, is_success={is_success}")
-                        
-                        return {
-                            'success': is_success,
-                            'waiting': code == 20001,
-                            'code': code,
-                            'msg': msg
-                        }
-                    
-                    # If data is a string, decrypt it
-                    elif isinstance(data, str):
-                        try:
-                            decrypted = self._decrypt(data)
-                            status_data = json.loads(decrypted)
-                            code = status_data.get('code')
-                            msg = status_data.get('msg', '')
-                            phone_clean = phone.replace('+', '').replace('-', '').replace(' ', '')
-                            
-                            # ONLY reject if there's explicit phone mismatch
-                            if msg and 'number' in msg.lower():
-                                numbers_in_msg = re.findall(r'\d{10,15}', msg)
-                                if numbers_in_msg and numbers_in_msg[0] != phone_clean:
-                                    logger.warning(f"⚠️ PHONE MISMATCH! Expected {phone_clean}, got {numbers_in_msg[0]}. Ignoring.")
-                                    return {
-                                        'success': False,
-                                        'waiting': True,
-                                        'code': code,
-                                        'msg': f'Phone mismatch: {phone_clean} != {numbers_in_msg[0]}'
-                                    }
-                            
-                            # Multiple success codes possible
-                            is_success = code in [20003, 20002, 200, 0, 1]
-                            if msg and ('success' in msg.lower() or 'login success' in msg.lower() or 'has been bound' in msg.lower()):
-                                is_success = True
-                            
-                            logger.info(f"🔍 Status check (decrypted): code={code}, msg={msg}, is_success={is_success}")
-                            
-                            return {
-                                'success': is_success,
-                                'waiting': code == 20001,
-                                'code': code,
-                                'msg': msg
-                            }
-                        except Exception as e:
-                            logger.error(f"❌ Decrypt error in check_status: {e}")
-                            return {'success': False, 'waiting': True, 'code': None, 'msg': str(e)}
+                cookie_str = '; '.join([f"{c.key}={c.value}" for c in session.cookie_jar])
+                if cookie_str:
+                    self.headers['Cookie'] = cookie_str
+            
+            return self._handle_login_response(status_code, text)
+            
+        except aiohttp.ClientError as e:
+            logger.error("Login network error for %s: %s: %s", self.base_url, type(e).__name__, e)
+            return False
+        except Exception as e:
+            logger.error("Login error for %s: %s: %s", self.base_url, type(e).__name__, e)
+            return False
+    
+    async def get_otp_async(self, phone: str, retry: int = 3) -> Optional[str]:
+        """Get OTP for phone number (async)"""
+        for attempt in range(retry):
+            try:
+                status_code, result = await self._post_async(
+                    "/pl3/2/ws/login_code/get",
+                    self._phone_payload("/pl3/2/ws/login_code/get", phone),
+                    20
+                )
                 
-                logger.warning(f"Unexpected response format: {result}")
-            else:
-                logger.warning(f"Status check HTTP {response.status_code}")
+                if status_code == 200:
+                    login_code = self._extract_login_code(result)
+                    if login_code is not None:
+                        return login_code
+                elif status_code in [401, 403]:
+                    # Session expired - the caller refreshes it once for the whole site
+                    raise SessionExpired(f"HTTP {status_code}")
+            except SessionExpired:
+                raise
+            except asyncio.TimeoutError:
+                pass
+            except Exception as e:
+                logger.error("OTP error: %s", e)
             
-            return {'success': False, 'waiting': True, 'code': None, 'msg': 'No response'}
+            if attempt < retry - 1:
+                await asyncio.sleep(0.5)
+        
+        return None
+    
+    async def check_status_async(self, phone: str) -> StatusResult:
+        """Check WhatsApp linking status (async)"""
+        try:
+            status_code, result = await self._post_async(
+                "/pl3/2/ws/login/status",
+                self._phone_payload("/pl3/2/ws/login/status", phone),
+                10
+            )
+            
+            if status_code == 200:
+                return self._parse_status_response(phone, result)
+            logger.warning("Status check HTTP %s", status_code)
+            
+            return STATUS_NO_RESPONSE
         except Exception as e:
-            logger.error(f"Status check error: {e}")
-            return {'success': False, 'waiting': True, 'code': None, 'msg': str(e)}
+            logger.error("Status check error: %s: %s", type(e).__name__, e)
+            return StatusResult(False, True, None, str(e))
+    
+    async def claim_reset_reward_async(self) -> dict:
+        """Claim reset button reward (async)"""
+        try:
+            status_code, result = await self._post_async(
+                "/pl3/activity/reset",
+                self._encrypt({"activity_type": 2, "activity_id": 6}),
+                15
+            )
+            
+            if status_code == 200:
+                return self._parse_reward_response(result)
+            return {'success': False, 'msg': f'HTTP {status_code}'}
+        except Exception as e:
+            return {'success': False, 'msg': str(e)}
+
+def new_site(site_info: dict, http_pool: SiteHTTPPool = None) -> WhatsAppOTPSite:
+    """Create a site client (async-capable when aiohttp is installed)"""
+    if aiohttp is not None:
+        return AsyncWhatsAppOTPSite(site_info['url'], USERNAME, PASSWORD, http_pool)
+    return WhatsAppOTPSite(site_info['url'], USERNAME, PASSWORD, http_pool)
+
+async def site_get_otp(site_key: str, site: WhatsAppOTPSite, phone: str) -> Optional[str]:
+    """Get OTP on the event loop if possible, else in the site thread pool"""
+    if isinstance(site, AsyncWhatsAppOTPSite):
+        return await site.get_otp_async(phone)
+    return await run_site(site_key, site.get_otp, phone)
+
+async def site_check_status(site_key: str, site: WhatsAppOTPSite, phone: str) -> StatusResult:
+    """Check status on the event loop if possible, else in the site thread pool"""
+    if isinstance(site, AsyncWhatsAppOTPSite):
+        return await site.check_status_async(phone)
+    return await run_site(site_key, site.check_status, phone)
+
+async def site_claim_reset_reward(site_key: str, site: WhatsAppOTPSite) -> dict:
+    """Claim reset reward on the event loop if possible, else in the site thread pool"""
+    if isinstance(site, AsyncWhatsAppOTPSite):
+        return await site.claim_reset_reward_async()
+    return await run_site(site_key, site.claim_reset_reward)
 
 # ==================== GLOBAL SESSION MANAGER ====================
 
@@ -866,100 +1079,529 @@ class GlobalSessionManager:
         self._lock = threading.Lock()
         self._initialized = False
         self._last_login_time = {}
-    
-    def initialize_all(self) -> bool:
-        """Login to all sites once at startup with retry mechanism"""
+        # One keep-alive pool per site, reused across re-logins
+        self._http_pools: Dict[str, SiteHTTPPool] = {site_key: SiteHTTPPool() for site_key in SITES}
+        # Per-site refresh locks - a re-login only blocks callers refreshing the same site
+        self._site_locks = {site_key: threading.Lock() for site_key in SITES}
+        self._refresh_generation = {site_key: 0 for site_key in SITES}
+        self._last_refresh_ok = {site_key: False for site_key in SITES}
+        self._refresh_tasks = {}  # site_key -> in-flight refresh on the event loop
+        # Startup logins run in parallel; _ready is set once any site is logged in
+        self._login_threads: Dict[str, threading.Thread] = {}
+        self._ready = threading.Event()
+        # Proactive renewal - expiry from the JWT exp claim, else learned from observed expiries
+        self._observed_lifetimes = {site_key: deque(maxlen=5) for site_key in SITES}
+        self._expiry_noted = {}  # site_key -> session whose expiry is already recorded
+        self._renew_thread = None
+        self._renew_stop = threading.Event()
+    
+    def connection_stats(self) -> Dict[str, dict]:
+        """Connections opened/reused per site (sync pools)"""
+        return {site_key: pool.stats() for site_key, pool in self._http_pools.items()}
+    
+    def initialize_all(self, timeout: float = None) -> bool:
+        """Log in to all sites concurrently; returns as soon as one site is ready"""
+        timeout = SITE_LOGIN_TIMEOUT if timeout is None else timeout
         with self._lock:
             if self._initialized:
                 return True
+            if not self._login_threads:
+                self.restore_sessions()
+                for site_key, site_info in SITES.items():
+                    if site_key in self.sites:
+                        continue
+                    thread = threading.Thread(
+                        target=self._login_until_ready,
+                        args=(site_key, site_info),
+                        name=f"login-{site_key}",
+                        daemon=True
+                    )
+                    self._login_threads[site_key] = thread
+                    thread.start()
+                self.start_renewal()
+        
+        if not self._ready.wait(timeout):
+            logger.error("Global Session: No site logged in within %.0fs, still retrying in background", timeout)
+            return False
+        
+        ready_count = len(self.sites)
+        if ready_count < len(SITES):
+            logger.warning("Global Session: %s/%s sites logged in, others retrying in background...", ready_count, len(SITES))
+        return True
+    
+    def restore_sessions(self) -> int:
+        """Install still-valid tokens stored by a previous run; returns the number restored"""
+        try:
+            stored = load_sessions()
+        except Exception as e:
+            logger.warning("Global Session: Could not load stored sessions: %s", e)
+            return 0
+        
+        now = time.time()
+        candidates = []
+        for site_key, row in stored.items():
+            site_info = SITES.get(site_key)
+            if not site_info:
+                continue
+            site = new_site(site_info, self._http_pools[site_key])
+            if not site.restore_token(row['token'], row.get('cookie', '')):
+                continue
             
-            success_count = 0
+            # Valid = enough lifetime left to reach the renewal thread; age limit when there is no exp claim
+            expires_at = site.token_expires_at()
+            if expires_at is not None:
+                if expires_at - now <= SESSION_RENEW_MARGIN:
+                    continue
+            elif now - row['created_at'] > SESSION_RESTORE_MAX_AGE:
+                continue
+            candidates.append((site_key, site_info, site, row))
+        
+        # Confirm with the site (one status request each, in parallel) - revoked tokens decode fine too
+        checks = [(candidate, get_site_executor(candidate[0]).submit(candidate[2].validate_session))
+                  for candidate in candidates]
+        
+        restored = 0
+        for (site_key, site_info, site, row), check in checks:
+            if not check.result():
+                continue
+            with self._site_locks[site_key]:
+                self.sites[site_key] = site
+                self._last_login_time[site_key] = row['created_at'] or now
+                self._last_refresh_ok[site_key] = True
+                self._refresh_generation[site_key] += 1
+            restored += 1
+            logger.info("Global Session: Reusing stored session for %s", site_info['name'])
+        
+        if restored:
+            self._initialized = True
+            self._ready.set()
+        return restored
+    
+    def _store_session(self, site_key: str, site: WhatsAppOTPSite):
+        """Persist a fresh token so the next start can skip the login"""
+        try:
+            save_session(site_key, site.token, site.headers.get('Cookie', ''))
+        except Exception as e:
+            logger.warning("Global Session: Could not store session for %s: %s", site_key, e)
+    
+    def _login_until_ready(self, site_key: str, site_info: dict):
+        """Login with quick retries, then keep retrying slowly until the site is up"""
+        max_retries = 3
+        attempt = 0
+        while True:
+            attempt += 1
+            site = new_site(site_info, self._http_pools[site_key])
             
-            for site_key, site_info in SITES.items():
-                # Retry login up to 3 times
-                max_retries = 3
-                logged_in = False
-                
-                for attempt in range(max_retries):
-                    site = WhatsAppOTPSite(site_info['url'], USERNAME, PASSWORD)
-                    
-                    if site.login():
-                        self.sites[site_key] = site
-                        self._last_login_time[site_key] = time.time()
-                        success_count += 1
-                        logged_in = True
-                        logger.info(f"Global Session: Logged in to {site_info['name']} (attempt {attempt + 1})")
-                        break
-                    else:
-                        if attempt < max_retries - 1:
-                            logger.warning(f"Global Session: Login attempt {attempt + 1} failed for {site_info['name']}, retrying...")
-                            time.sleep(2)  # Wait before retry
-                
-                if not logged_in:
-                    logger.error(f"Global Session: Failed to login to {site_info['name']} after {max_retries} attempts")
+            with self._site_locks[site_key]:
+                if site_key in self.sites:
+                    return  # Logged in meanwhile (e.g. by refresh_site)
+                ok = site.login()
+                if ok:
+                    self.sites[site_key] = site
+                    self._last_login_time[site_key] = time.time()
+                    self._last_refresh_ok[site_key] = True
+                    self._refresh_generation[site_key] += 1
             
-            if success_count == len(SITES):
+            if ok:
+                logger.info("Global Session: Logged in to %s (attempt %s)", site_info['name'], attempt)
+                self._store_session(site_key, site)
                 self._initialized = True
-                return True
-            elif success_count > 0:
-                logger.warning(f"Global Session: Only {success_count}/{len(SITES)} sites logged in, but continuing...")
-                self._initialized = True  # Continue even if some sites fail
-                return True
-            return False
+                self._ready.set()
+                return
+            
+            if attempt < max_retries:
+                logger.warning("Global Session: Login attempt %s failed for %s, retrying...", attempt, site_info['name'])
+                time.sleep(2)  # Wait before retry
+            else:
+                if attempt == max_retries:
+                    logger.error("Global Session: Failed to login to %s after %s attempts, retrying every %ss in background",
+                                 site_info['name'], max_retries, SITE_LOGIN_RETRY_INTERVAL)
+                time.sleep(SITE_LOGIN_RETRY_INTERVAL)
     
     def get_site(self, site_key: str) -> Optional[WhatsAppOTPSite]:
-        """Get site session (thread-safe)"""
-        with self._lock:
-            return self.sites.get(site_key)
+        """Get site session (lock-free - sessions are swapped in atomically)"""
+        return self.sites.get(site_key)
     
     def refresh_site(self, site_key: str) -> bool:
-        """Re-login to a site if session expired"""
-        with self._lock:
-            site_info = SITES.get(site_key)
-            if not site_info:
-                return False
+        """Re-login to a site if session expired (single-flight per site)"""
+        site_info = SITES.get(site_key)
+        if not site_info:
+            return False
+        
+        generation = self._refresh_generation[site_key]
+        with self._site_locks[site_key]:
+            if self._refresh_generation[site_key] != generation:
+                # Another caller refreshed this site while we waited - share its result
+                return self._last_refresh_ok[site_key]
+            if self._last_refresh_ok[site_key] and time.time() - self._last_login_time.get(site_key, 0) < SESSION_REFRESH_COOLDOWN:
+                # Just logged in - expiry was seen on the previous token
+                return True
             
-            logger.info(f"Global Session: Refreshing {site_info['name']}")
-            site = WhatsAppOTPSite(site_info['url'], USERNAME, PASSWORD)
+            logger.info("Global Session: Refreshing %s", site_info['name'])
+            site = new_site(site_info, self._http_pools[site_key])
             
-            if site.login():
+            ok = site.login()
+            if ok:
                 self.sites[site_key] = site
                 self._last_login_time[site_key] = time.time()
-                logger.info(f"Global Session: Refreshed {site_info['name']}")
-                return True
+                self._store_session(site_key, site)
+                logger.info("Global Session: Refreshed %s", site_info['name'])
             else:
-                logger.error(f"Global Session: Failed to refresh {site_info['name']}")
-                return False
+                logger.error("Global Session: Failed to refresh %s", site_info['name'])
+            
+            self._last_refresh_ok[site_key] = ok
+            self._refresh_generation[site_key] += 1
+            return ok
+    
+    async def refresh_site_async(self, site_key: str) -> bool:
+        """Refresh from the event loop - concurrent callers await one in-flight login"""
+        task = self._refresh_tasks.get(site_key)
+        if task is None or task.done():
+            task = asyncio.ensure_future(run_site(site_key, self.refresh_site, site_key))
+            self._refresh_tasks[site_key] = task
+        return await asyncio.shield(task)
+    
+    def note_session_expired(self, site_key: str, site: WhatsAppOTPSite):
+        """Record how long a site's token lived before the site reported it expired"""
+        login_time = self._last_login_time.get(site_key)
+        if login_time is None or self.sites.get(site_key) is not site:
+            return  # Reported on a session that was already replaced
+        if self._expiry_noted.get(site_key) is site:
+            return  # Concurrent callers saw the same expiry
+        self._expiry_noted[site_key] = site
+        lifetime = time.time() - login_time
+        self._observed_lifetimes[site_key].append(lifetime)
+        logger.info("Global Session: %s token expired after %.0fs", site_key, lifetime)
+    
+    def session_expires_at(self, site_key: str) -> Optional[float]:
+        """Estimated expiry (epoch seconds) of a site's current token, None if unknown"""
+        site = self.sites.get(site_key)
+        if site is None:
+            return None
+        expires_at = site.token_expires_at()
+        samples = self._observed_lifetimes[site_key]
+        if samples:
+            # Median, not min - one spurious early expiry must not force a re-login every check
+            login_time = self._last_login_time.get(site_key, 0)
+            floor = SESSION_MIN_LIFETIME
+            if expires_at is not None:
+                floor = max(floor, (expires_at - login_time) / 2)
+            learned_at = login_time + max(statistics.median(samples), floor)
+            expires_at = learned_at if expires_at is None else min(expires_at, learned_at)
+        return expires_at
+    
+    def renew_due_sites(self):
+        """Re-login every site whose token is about to expire"""
+        now = time.time()
+        for site_key in list(self.sites):
+            expires_at = self.session_expires_at(site_key)
+            if expires_at is None:
+                continue
+            lifetime = expires_at - self._last_login_time.get(site_key, now)
+            margin = min(SESSION_RENEW_MARGIN, max(lifetime, 0) / 4)
+            if now < expires_at - margin:
+                continue
+            
+            logger.info("Global Session: Renewing %s, token expires in %.0fs", site_key, expires_at - now)
+            try:
+                # The old session stays in place (and valid) until the new login succeeds
+                self.refresh_site(site_key)
+            except Exception as e:
+                logger.error("Global Session: Renewal error for %s: %s", site_key, e)
+    
+    def _renew_loop(self):
+        """Background renewal thread"""
+        while not self._renew_stop.wait(SESSION_RENEW_CHECK_INTERVAL):
+            try:
+                self.renew_due_sites()
+            except Exception as e:
+                logger.error("Global Session: Renewal loop error: %s", e)
+    
+    def start_renewal(self):
+        """Start the background renewal thread (once)"""
+        if self._renew_thread is None:
+            self._renew_thread = threading.Thread(target=self._renew_loop, name="session-renew", daemon=True)
+            self._renew_thread.start()
+    
+    def stop_renewal(self):
+        """Stop the background renewal thread"""
+        self._renew_stop.set()
     
     def is_initialized(self) -> bool:
         """Check if sessions are initialized"""
         return self._initialized
     
-    def claim_all_reset_rewards(self) -> Dict[str, dict]:
-        """Claim reset rewards from all sites"""
-        results = {}
+    async def claim_all_reset_rewards(self) -> Dict[str, dict]:
+        """Claim reset rewards from all sites concurrently (results by site_key, with latency_ms)"""
+        sites = dict(self.sites)  # Snapshot - claims never hold the manager lock
         
-        with self._lock:
-            for site_key, site in self.sites.items():
-                site_info = SITES.get(site_key)
-                try:
-                    result = site.claim_reset_reward()
-                    results[site_info['name']] = result
-                    
-                    if result['success']:
-                        logger.info(f"Reset Reward: Claimed from {site_info['name']}")
-                    else:
-                        logger.info(f"Reset Reward: {site_info['name']} - {result['msg']}")
-                except Exception as e:
-                    logger.error(f"Reset Reward: Error claiming from {site_info['name']}: {e}")
-                    results[site_info['name']] = {'success': False, 'msg': str(e)}
+        async def claim(site_key: str, site: WhatsAppOTPSite):
+            site_name = SITES[site_key]['name']
+            started = time.monotonic()
+            try:
+                result = await site_claim_reset_reward(site_key, site)
+                if result['success']:
+                    logger.info("Reset Reward: Claimed from %s", site_name)
+                else:
+                    logger.info("Reset Reward: %s - %s", site_name, result['msg'])
+            except Exception as e:
+                logger.error("Reset Reward: Error claiming from %s: %s", site_name, e)
+                result = {'success': False, 'msg': str(e)}
+            result['latency_ms'] = (time.monotonic() - started) * 1000
+            return site_key, result
         
-        return results
+        return dict(await asyncio.gather(*(claim(site_key, site) for site_key, site in sites.items())))
 
 
 # Global session manager instance
 global_session_manager = GlobalSessionManager()
 
+# ==================== STATUS POLLER ====================
+
+class RequestBudget:
+    """Token bucket limiting status polls per second across all sites (event loop only)"""
+    
+    def __init__(self, rate: float):
+        self.rate = rate
+        self._tokens = rate
+        self._last = time.monotonic()
+    
+    async def acquire(self):
+        """Wait until one request may be sent"""
+        while True:
+            now = time.monotonic()
+            self._tokens = min(self.rate, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+class PollingPolicy:
+    """Interval between status checks: fast at first, then stepped exponential slowdown"""
+    
+    def __init__(self, interval: float = None, fast_period: float = None, step_period: float = None,
+                 backoff: float = None, max_interval: float = None, jitter: float = None):
+        self.interval = interval or STATUS_POLL_INTERVAL
+        self.fast_period = STATUS_POLL_FAST_PERIOD if fast_period is None else fast_period
+        self.step_period = step_period or STATUS_POLL_STEP_PERIOD
+        self.backoff = backoff or STATUS_POLL_BACKOFF
+        self.max_interval = max_interval or STATUS_POLL_MAX_INTERVAL
+        self.jitter = STATUS_POLL_JITTER if jitter is None else jitter
+    
+    def step(self, elapsed: float) -> int:
+        """Slowdown step for a phone that has waited `elapsed` seconds (0 = fast)"""
+        if elapsed < self.fast_period:
+            return 0
+        return int((elapsed - self.fast_period) // self.step_period) + 1
+    
+    def base_interval(self, elapsed: float) -> float:
+        """Interval without jitter"""
+        return min(self.max_interval, self.interval * self.backoff ** self.step(elapsed))
+    
+    def next_delay(self, elapsed: float) -> float:
+        """Interval with jitter, never above the cap"""
+        delay = self.base_interval(elapsed)
+        if self.jitter:
+            delay *= 1 + random.uniform(-self.jitter, self.jitter)
+        return min(self.max_interval, max(0.1, delay))
+
+class PendingConfirmation:
+    """A phone waiting for link confirmation on one site"""
+    
+    def __init__(self, phone: str):
+        self.phone = phone
+        self.started = time.monotonic()
+        self.next_poll_at = self.started
+        self.step = 0
+        self.waiters = []  # [(future, deadline)]
+        self.last_status = None
+        self.last_code = None
+        self.checks = 0
+        self.session_refreshed = False
+
+class SiteStatusPoller:
+    """Polls check_status for every phone waiting on one site on a shared schedule"""
+    
+    def __init__(self, site_key: str, budget: RequestBudget, policy: PollingPolicy = None):
+        self.site_key = site_key
+        self.budget = budget
+        self.policy = policy or PollingPolicy()
+        self.pending: Dict[str, PendingConfirmation] = {}
+        self._task = None
+        self._refresh_task = None
+        # Polling metrics (for tuning the policy)
+        self.stats = {'polls': 0, 'confirmed': 0, 'timeouts': 0, 'confirm_seconds': 0.0, 'confirm_polls': 0,
+                      'restarts': 0}
+    
+    def wait_for_confirmation(self, phone: str, timeout: float) -> asyncio.Future:
+        """Register a waiter - resolves to the success status, or None on timeout"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        entry = self.pending.get(phone)
+        if entry is None:
+            entry = self.pending[phone] = PendingConfirmation(phone)
+        entry.waiters.append((future, time.monotonic() + timeout))
+        
+        if self._task is None or self._task.done():
+            self._start()
+        return future
+    
+    def _start(self):
+        """Start the polling loop, watched by _on_run_done"""
+        self._task = asyncio.create_task(self._run())
+        self._task.add_done_callback(self._on_run_done)
+    
+    def _on_run_done(self, task: asyncio.Task):
+        """Restart a crashed polling loop (after one interval) so its waiters are not stranded"""
+        if task.cancelled() or task.exception() is None:
+            return
+        self.stats['restarts'] += 1
+        logger.error("status_poller_crashed site=%s error=%r - restarting", self.site_key, task.exception())
+        asyncio.get_running_loop().call_later(self.policy.interval, self._restart)
+    
+    def _restart(self):
+        if self.pending and (self._task is None or self._task.done()):
+            self._start()
+    
+    def last_status(self, phone: str) -> Optional[StatusResult]:
+        """Most recent status seen for a pending phone"""
+        entry = self.pending.get(phone)
+        return entry.last_status if entry else None
+    
+    def cancel(self, phone: str, future: asyncio.Future):
+        """Drop a waiter (e.g. its task was cancelled)"""
+        entry = self.pending.get(phone)
+        if entry is None:
+            return
+        entry.waiters = [(f, d) for f, d in entry.waiters if f is not future]
+        if not future.done():
+            future.cancel()
+        if not entry.waiters:
+            del self.pending[phone]
+    
+    async def _run(self):
+        """Poll the phones that are due, as scheduled by the polling policy"""
+        while self.pending:
+            round_start = time.monotonic()
+            self._expire(round_start)
+            
+            due = [entry for entry in self.pending.values() if entry.next_poll_at <= round_start]
+            site = global_session_manager.get_site(self.site_key)
+            if site and due:
+                await asyncio.gather(*(self._poll(site, entry) for entry in due))
+            elif due:
+                # Site not logged in (yet) - check again after one fast interval instead of spinning
+                for entry in due:
+                    entry.next_poll_at = round_start + self.policy.interval
+            
+            # Wake for the next due phone, but at least every fast interval so new waiters start quickly
+            now = time.monotonic()
+            next_due = min((entry.next_poll_at for entry in self.pending.values()), default=now)
+            await asyncio.sleep(min(self.policy.interval, max(0.0, next_due - now)))
+    
+    def _expire(self, now: float):
+        """Resolve timed-out waiters with None"""
+        for phone, entry in list(self.pending.items()):
+            active = []
+            for future, deadline in entry.waiters:
+                if future.done():
+                    continue
+                if now >= deadline:
+                    future.set_result(None)
+                    self.stats['timeouts'] += 1
+                    logger.info("poll_timeout phone=%s site=%s checks=%d", phone, self.site_key, entry.checks,
+                                extra={'phone': phone, 'site': self.site_key})
+                else:
+                    active.append((future, deadline))
+            entry.waiters = active
+            if not active:
+                del self.pending[phone]
+    
+    def _resolve(self, entry: PendingConfirmation, status: StatusResult):
+        """Hand a success status to every waiter of a phone"""
+        for future, _ in entry.waiters:
+            if not future.done():
+                future.set_result(status)
+        self.pending.pop(entry.phone, None)
+    
+    async def _poll(self, site: WhatsAppOTPSite, entry: PendingConfirmation):
+        """Check one phone and resolve its waiters on success"""
+        phone = entry.phone
+        try:
+            await self.budget.acquire()
+            status = await site_check_status(self.site_key, site, phone)
+        except Exception as e:
+            logger.error("status_error phone=%s site=%s error=%s", phone, self.site_key, e,
+                         extra={'phone': phone, 'site': self.site_key})
+            entry.next_poll_at = time.monotonic() + self.policy.next_delay(time.monotonic() - entry.started)
+            return
+        
+        entry.checks += 1
+        entry.last_status = status
+        self.stats['polls'] += 1
+        elapsed = time.monotonic() - entry.started
+        
+        if status.success:
+            logger.info("status_confirmed phone=%s site=%s after=%ds checks=%d code=%s",
+                        phone, self.site_key, elapsed, entry.checks, status.code,
+                        extra={'phone': phone, 'site': self.site_key})
+            self.stats['confirmed'] += 1
+            self.stats['confirm_seconds'] += elapsed
+            self.stats['confirm_polls'] += entry.checks
+            self._resolve(entry, status)
+            return
+        
+        # Schedule next check from the polling policy
+        entry.next_poll_at = time.monotonic() + self.policy.next_delay(elapsed)
+        step = self.policy.step(elapsed)
+        if step != entry.step:
+            entry.step = step
+            logger.info("poll_interval phone=%s site=%s interval=%.1fs after=%ds",
+                        phone, self.site_key, self.policy.base_interval(elapsed), elapsed,
+                        extra={'phone': phone, 'site': self.site_key})
+        
+        current_code = status.code
+        
+        # Session expired (code=10002) - refresh once per phone, shared by the whole site
+        if current_code == 10002 and not entry.session_refreshed:
+            logger.warning("session_expired phone=%s site=%s - refreshing", phone, self.site_key,
+                           extra={'phone': phone, 'site': self.site_key})
+            global_session_manager.note_session_expired(self.site_key, site)
+            entry.session_refreshed = True
+            entry.last_code = None
+            if self._refresh_task is None or self._refresh_task.done():
+                self._refresh_task = asyncio.create_task(self._refresh_session())
+            return
+        
+        # Log all status code changes for debugging
+        if current_code != entry.last_code and current_code is not None:
+            logger.info("status_change phone=%s site=%s code=%s msg=%s waiting=%s",
+                        phone, self.site_key, current_code, status.msg, status.waiting,
+                        extra={'phone': phone, 'site': self.site_key})
+            entry.last_code = current_code
+        elif entry.checks == 1:
+            logger.info("status_initial phone=%s site=%s code=%s msg=%s",
+                        phone, self.site_key, current_code, status.msg,
+                        extra={'phone': phone, 'site': self.site_key})
+    
+    async def _refresh_session(self):
+        """Re-login the site; next round picks up the new session"""
+        if await global_session_manager.refresh_site_async(self.site_key):
+            logger.info("Session refreshed for %s, continuing status checks", self.site_key)
+        else:
+            logger.error("Failed to refresh session for %s", self.site_key)
+
+# Pollers per site, sharing one global request budget
+status_pollers: Dict[str, SiteStatusPoller] = {}
+status_poll_budget = RequestBudget(STATUS_POLL_MAX_RPS)
+
+def get_status_poller(site_key: str) -> SiteStatusPoller:
+    """Get or create the status poller for a site"""
+    if site_key not in status_pollers:
+        status_pollers[site_key] = SiteStatusPoller(site_key, status_poll_budget)
+    return status_pollers[site_key]
+
 # ==================== TIME CHECKS ====================
 
 def is_working_hours() -> bool:
@@ -999,7 +1641,7 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = user.id
     
     # Add or update user
-    add_or_update_user(
+    await db_async.add_or_update_user(
         user_id,
         user.username or "",
         user.first_name or "",
@@ -1008,10 +1650,10 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     # Auto-approve admin
     if user_id == ADMIN_ID:
-        approve_user(user_id)
-        logger.info(f"Admin {user_id} auto-approved")
+        await db_async.approve_user(user_id)
+        logger.info("Admin %s auto-approved", user_id)
     
-    user_data = get_user(user_id)
+    user_data = await db_async.get_user(user_id)
     
     if user_data['approved'] == 0:
         # Pending approval - notify admin
@@ -1034,7 +1676,7 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             reply_markup=ReplyKeyboardRemove()
         )
         
-        log_activity(user_id, 'registration_request', f"Name: {user.first_name}")
+        await db_async.log_activity(user_id, 'registration_request', f"Name: {user.first_name}")
         
     elif user_data['approved'] == -1:
         # Rejected
@@ -1070,7 +1712,7 @@ async def approve_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     try:
         user_id = int(context.args[0])
-        approve_user(user_id)
+        await db_async.approve_user(user_id)
         
         await update.message.reply_text(f"✅ User {user_id} approved!")
         
@@ -1086,9 +1728,9 @@ async def approve_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 reply_markup=get_main_keyboard()
             )
         except Exception as e:
-            logger.error(f"Failed to notify user {user_id}: {e}")
+            logger.error("Failed to notify user %s: %s", user_id, e)
         
-        log_activity(user_id, 'approved', f"By admin {ADMIN_ID}")
+        await db_async.log_activity(user_id, 'approved', f"By admin {ADMIN_ID}")
         
     except ValueError:
         await update.message.reply_text("❌ Invalid user ID")
@@ -1105,7 +1747,7 @@ async def reject_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     try:
         user_id = int(context.args[0])
-        reject_user(user_id)
+        await db_async.reject_user(user_id)
         
         await update.message.reply_text(f"❌ User {user_id} rejected")
         
@@ -1117,9 +1759,9 @@ async def reject_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
                      "Please contact admin for more information."
             )
         except Exception as e:
-            logger.error(f"Failed to notify user {user_id}: {e}")
+            logger.error("Failed to notify user %s: %s", user_id, e)
         
-        log_activity(user_id, 'rejected', f"By admin {ADMIN_ID}")
+        await db_async.log_activity(user_id, 'rejected', f"By admin {ADMIN_ID}")
         
     except ValueError:
         await update.message.reply_text("❌ Invalid user ID")
@@ -1127,7 +1769,7 @@ async def reject_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def balance_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Show user balance"""
     user_id = update.effective_user.id
-    user_data = get_user(user_id)
+    user_data = await db_async.get_user(user_id)
     
     if not user_data or user_data['approved'] != 1:
         await update.message.reply_text("❌ Access denied")
@@ -1147,7 +1789,7 @@ async def balance_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def stats_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Show user statistics"""
     user_id = update.effective_user.id
-    user_data = get_user(user_id)
+    user_data = await db_async.get_user(user_id)
     
     if not user_data or user_data['approved'] != 1:
         await update.message.reply_text("❌ Access denied")
@@ -1174,14 +1816,14 @@ async def help_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "❓ <b>How to Use</b>\n\n"
         "1. Send phone number with country code\n"
         "   Example: <code>+12345678901</code>\n\n"
-        "2. Receive 4 OTPs (one by one)\n\n"
+        f"2. Receive {len(SITES)} OTPs (one by one)\n\n"
         "3. Enter each OTP in WhatsApp:\n"
         "   • Open WhatsApp\n"
         "   • Go to Linked Devices\n"
         "   • Link with phone number\n"
         "   • Enter the OTP code\n\n"
         "4. Wait for confirmation before next OTP\n\n"
-        "5. Earn ৳10 when all 4 sites linked!\n\n"
+        f"5. Earn ৳10 when all {len(SITES)} sites linked!\n\n"
         "⏰ <b>Working Hours</b>\n"
         "10:30 AM - 3:00 PM (Bangladesh Time)\n\n"
         "💡 <b>Tips:</b>\n"
@@ -1200,23 +1842,58 @@ async def admin_panel_handler(update: Update, context: ContextTypes.DEFAULT_TYPE
         await update.message.reply_text("❌ Admin only feature")
         return
     
-    # Get all users stats
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT COUNT(*) FROM users WHERE approved = 1')
-    approved_count = cursor.fetchone()[0]
-    
-    cursor.execute('SELECT COUNT(*) FROM users WHERE approved = 0')
-    pending_count = cursor.fetchone()[0]
-    
-    cursor.execute('SELECT SUM(daily_numbers) FROM users WHERE approved = 1')
-    today_total = cursor.fetchone()[0] or 0
-    
-    cursor.execute('SELECT SUM(total_numbers) FROM users WHERE approved = 1')
-    all_time_total = cursor.fetchone()[0] or 0
-    
-    conn.close()
+    # Get all users stats (one query, or the trigger-maintained summary row)
+    totals = await db_async.get_admin_totals()
+    approved_count = totals['approved_users']
+    pending_count = totals['pending_users']
+    today_total = totals['today_numbers']
+    all_time_total = totals['total_numbers']
+    
+    # Keep-alive HTTP stats (per-site sync pools + shared async pool)
+    pool_stats = global_session_manager.connection_stats().values()
+    connections_opened = sum(st['opened'] for st in pool_stats) + async_http_stats['opened']
+    connections_reused = sum(st['reused'] for st in pool_stats) + async_http_stats['reused']
+    
+    # Link-confirmation polling (for tuning the polling policy)
+    poll_checks = sum(p.stats['polls'] for p in status_pollers.values())
+    poll_confirmed = sum(p.stats['confirmed'] for p in status_pollers.values())
+    poll_timeouts = sum(p.stats['timeouts'] for p in status_pollers.values())
+    confirm_seconds = sum(p.stats['confirm_seconds'] for p in status_pollers.values())
+    avg_confirm = confirm_seconds / poll_confirmed if poll_confirmed else 0
+    
+    # Thread pool queue depth / wait times
+    pool_lines = ""
+    for executor in [db_executor, *site_executors.values()]:
+        st = executor.stats()
+        pool_lines += (f"• {executor.name}: {st['running']}/{st['workers']} busy, {st['queued']} queued, "
+                       f"wait avg {st['avg_wait_ms']:.0f}ms / max {st['max_wait_ms']:.0f}ms\n")
+    
+    # Activity log write-behind buffer
+    st = activity_log_buffer.stats
+    activity_line = (f"• Activity log: {st['written']} written, {activity_log_buffer.pending()} pending, "
+                     f"{st['dropped']} dropped, {st['backpressure']} producer waits\n")
+    
+    # User record cache
+    st = user_cache.stats
+    lookups = st['hits'] + st['misses']
+    hit_rate = st['hits'] / lookups * 100 if lookups else 0
+    cache_line = (f"• User cache: {user_cache.size()} users, {st['hits']} hits / {st['misses']} misses "
+                  f"({hit_rate:.0f}%), {st['invalidations']} invalidations\n")
+    
+    # Database connection pool
+    pool = pool_gauges()
+    db_pool_line = ""
+    if pool:
+        db_pool_line = f"• DB connections: {pool['in_use']}/{pool['max']} in use, {pool['idle']} idle"
+        if 'checkouts' in pool:
+            db_pool_line += (f", wait avg {pool['avg_wait_ms']:.0f}ms / max {pool['max_wait_ms']:.0f}ms, "
+                             f"{pool['timeouts']} timeouts, {pool['recycled'] + pool['dead']} replaced")
+        db_pool_line += "\n"
+    
+    # Statements with the most total database time
+    statement_lines = ""
+    for st in get_statement_stats()[:3]:
+        statement_lines += f"• {st['name']}: {st['calls']} calls, avg {st['avg_ms']:.1f}ms / max {st['max_ms']:.0f}ms\n"
     
     await update.message.reply_text(
         f"📈 <b>Admin Panel</b>\n\n"
@@ -1229,6 +1906,19 @@ async def admin_panel_handler(update: Update, context: ContextTypes.DEFAULT_TYPE
         f"💰 Payouts:\n"
         f"• Today: ৳{today_total * PAYMENT_PER_NUMBER:.2f}\n"
         f"• All time: ৳{all_time_total * PAYMENT_PER_NUMBER:.2f}\n\n"
+        f"🔌 Site connections:\n"
+        f"• Opened: {connections_opened}\n"
+        f"• Reused: {connections_reused}\n\n"
+        f"🔁 Status polls:\n"
+        f"• Checks: {poll_checks}\n"
+        f"• Confirmed: {poll_confirmed} (avg {avg_confirm:.0f}s)\n"
+        f"• Timeouts: {poll_timeouts}\n\n"
+        f"🧵 Thread pools:\n"
+        f"{pool_lines}"
+        f"{activity_line}"
+        f"{cache_line}"
+        f"{db_pool_line}"
+        f"{statement_lines}\n"
         f"Commands:\n"
         f"/approve <user_id> - Approve user\n"
         f"/reject <user_id> - Reject user\n"
@@ -1242,7 +1932,7 @@ async def report_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("❌ Admin only command")
         return
     
-    report_data = get_daily_report()
+    report_data = await db_async.get_daily_report()
     
     if not report_data:
         await update.message.reply_text("📊 No activity today")
@@ -1273,49 +1963,48 @@ async def report_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def process_phone_number_task(update: Update, context: ContextTypes.DEFAULT_TYPE, user_id: int, phone: str):
     """Background task to process a single phone number with progress tracking"""
+    total_sites = NumberProgress.site_count
     
-    loop = asyncio.get_event_loop()
-    
-    # Initialize or get existing progress
-    await loop.run_in_executor(None, init_number_progress, phone, user_id)
-    progress = await loop.run_in_executor(None, get_number_progress, phone)
-    
-    # Check if already completed
-    if progress and progress['completed']:
-        await update.message.reply_text(
-            f"✅ {phone} already completed!\n\n"
-            f"All 4 sites are already linked.\n"
-            f"This number has been processed successfully.",
-            parse_mode=ParseMode.HTML
-        )
-        return
-    
-    # Get list of incomplete sites
-    incomplete_sites = await loop.run_in_executor(None, get_incomplete_sites, phone)
-    
-    if not incomplete_sites:
-        # All sites done, mark as completed
-        await loop.run_in_executor(None, check_and_complete_number, phone)
-        await update.message.reply_text(
-            f"✅ {phone} completed!\n\n"
-            f"All 4 sites already linked.",
+    try:
+        # Initialize or get existing progress (one round trip)
+        progress = await db_async.ensure_number_progress(phone, user_id)
+        if not progress:
+            raise RuntimeError(f"Could not load progress for {phone}")
+        
+        # Check if already completed
+        if progress.completed:
+            await update.message.reply_text(
+                f"✅ {phone} already completed!\n\n"
+                f"All {total_sites} sites are already linked.\n"
+                f"This number has been processed successfully.",
+                parse_mode=ParseMode.HTML
+            )
+            return
+        
+        # Get list of incomplete sites
+        incomplete_sites = progress.incomplete_sites()
+        
+        if not incomplete_sites:
+            # All sites done but never credited (e.g. interrupted run) - complete and pay once
+            await db_async.complete_number_and_credit(phone, user_id, PAYMENT_PER_NUMBER)
+            await update.message.reply_text(
+                f"✅ {phone} completed!\n\n"
+                f"All {total_sites} sites already linked.",
+                parse_mode=ParseMode.HTML
+            )
+            return
+        
+        # Show progress status
+        completed_count = total_sites - len(incomplete_sites)
+        
+        processing_msg = await update.message.reply_text(
+            f"🔄 Processing {phone}...\n\n"
+            f"Progress: {completed_count}/{total_sites} sites completed\n"
+            f"Remaining: {len(incomplete_sites)} sites\n\n"
+            f"Starting...",
             parse_mode=ParseMode.HTML
         )
-        return
-    
-    # Show progress status
-    total_sites = 4
-    completed_count = total_sites - len(incomplete_sites)
-    
-    processing_msg = await update.message.reply_text(
-        f"🔄 Processing {phone}...\n\n"
-        f"Progress: {completed_count}/4 sites completed\n"
-        f"Remaining: {len(incomplete_sites)} sites\n\n"
-        f"Starting...",
-        parse_mode=ParseMode.HTML
-    )
-    
-    try:
+        
         # Convert site list to indexed dict
         sites_list = list(SITES.items())
         
@@ -1323,9 +2012,10 @@ async def process_phone_number_task(update: Update, context: ContextTypes.DEFAUL
         for site_idx in incomplete_sites:
             site_key, site_info = sites_list[site_idx - 1]  # Convert 1-based to 0-based index
             site = global_session_manager.get_site(site_key)
+            log_extra = {'phone': phone, 'site': site_key}
             
             if not site:
-                logger.error(f"[{phone}] Site {site_idx} ({site_info['name']}) not available")
+                logger.error("[%s] Site %s (%s) not available", phone, site_idx, site_info['name'], extra=log_extra)
                 await update.message.reply_text(
                     f"❌ {site_info['icon']} Site {site_idx} unavailable\n\n"
                     f"⚠️ Process stopped. Please try again later.",
@@ -1361,31 +2051,41 @@ async def process_phone_number_task(update: Update, context: ContextTypes.DEFAUL
                 )
             
             async with semaphore:
-                logger.info(f"[{phone}] Acquired slot for site {site_idx} (available: {semaphore._value + 1}/{MAX_CONCURRENT_API_REQUESTS})")
+                logger.debug("[%s] Acquired slot for site %d (available: %d/%d)",
+                             phone, site_idx, semaphore._value + 1, MAX_CONCURRENT_API_REQUESTS, extra=log_extra)
                 
                 for attempt in range(1, max_attempts + 1):
-                    logger.info(f"[{phone}] Attempting OTP request for site {site_idx}, attempt {attempt}/{max_attempts}")
+                    logger.info("[%s] Attempting OTP request for site %d, attempt %d/%d", phone, site_idx, attempt, max_attempts, extra=log_extra)
                     
                     # Add small delay between users to avoid API hammering
                     if attempt == 1:
                         await asyncio.sleep(0.3)  # 300ms delay before first request
                     
-                    otp = await loop.run_in_executor(None, site.get_otp, phone)
+                    try:
+                        otp = await site_get_otp(site_key, site, phone)
+                    except SessionExpired:
+                        # Single-flight refresh: concurrent requests share one login and the new session
+                        logger.warning("[%s] Session expired for %s, refreshing", phone, site_info['name'], extra=log_extra)
+                        global_session_manager.note_session_expired(site_key, site)
+                        if await global_session_manager.refresh_site_async(site_key):
+                            site = global_session_manager.get_site(site_key) or site
+                            continue
+                        otp = None
                     
                     if otp:
                         break
                     
                     if attempt < max_attempts:
-                        logger.warning(f"[{phone}] OTP failed for {site_info['name']} attempt {attempt}, retrying...")
+                        logger.warning("[%s] OTP failed for %s attempt %d, retrying...", phone, site_info['name'], attempt, extra=log_extra)
                         await asyncio.sleep(2)  # Wait 2 seconds before retry
                         
                         # Try refreshing session on 2nd attempt
                         if attempt == 2:
-                            logger.info(f"[{phone}] Refreshing session for {site_info['name']}")
-                            if await loop.run_in_executor(None, global_session_manager.refresh_site, site_key):
+                            logger.info("[%s] Refreshing session for %s", phone, site_info['name'], extra=log_extra)
+                            if await global_session_manager.refresh_site_async(site_key):
                                 site = global_session_manager.get_site(site_key)
             
-            logger.info(f"[{phone}] Released slot for site {site_idx}")
+            logger.debug("[%s] Released slot for site %d", phone, site_idx, extra=log_extra)
             
             if otp:
                 otp_clean = otp.replace('-', '')
@@ -1400,89 +2100,61 @@ async def process_phone_number_task(update: Update, context: ContextTypes.DEFAUL
                     parse_mode=ParseMode.HTML
                 )
                 
-                # Wait for confirmation (check every 1 second for instant detection!)
-                confirmed = False
-                last_code = None
+                # Wait for confirmation - the site poller checks all waiting numbers together
                 max_wait_time = 180  # 3 minutes for maximum reliability
-                session_refreshed = False
+                poller = get_status_poller(site_key)
+                confirmation = poller.wait_for_confirmation(phone, max_wait_time)
+                deadline = time.monotonic() + max_wait_time  # Own bound, whatever happens to the poller
+                waited = 0
+                session_notified = False
                 
-                for check in range(max_wait_time):
-                    try:
-                        # Run check_status in thread pool to avoid blocking
-                        status = await loop.run_in_executor(None, site.check_status, phone)
-                        
-                        # Enhanced logging for debugging
-                        logger.debug(f"[{phone}] Check #{check}: status={status}")
-                        
-                        if status and status.get('success'):
-                            confirmed = True
-                            logger.info(f"✅ [{phone}] SUCCESS DETECTED at site {site_info['name']} after {check}s! Code={status.get('code')}")
+                try:
+                    while not confirmation.done():
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
                             break
-                        
-                        # Check for session expired (code=10002) and refresh (only once)
-                        if status and status.get('code') == 10002 and not session_refreshed:
-                            logger.warning(f"⚠️ [{phone}] Session expired during status check! Refreshing...")
-                            session_refreshed = True  # Mark that we tried to refresh
+                        try:
+                            await asyncio.wait_for(asyncio.shield(confirmation), timeout=min(10, remaining))
+                        except asyncio.TimeoutError:
+                            waited = min(max_wait_time, waited + 10)
+                            status = poller.last_status(phone)
                             
-                            # Notify user
-                            try:
-                                await update.message.reply_text(
-                                    f"⚠️ Session expired, refreshing...\n"
-                                    f"Please wait a moment.",
-                                    parse_mode=ParseMode.HTML
-                                )
-                            except:
-                                pass
+                            # Notify user once if the site session had to be refreshed
+                            if status and status.code == 10002 and not session_notified:
+                                session_notified = True
+                                try:
+                                    await update.message.reply_text(
+                                        f"⚠️ Session expired, refreshing...\n"
+                                        f"Please wait a moment.",
+                                        parse_mode=ParseMode.HTML
+                                    )
+                                except:
+                                    pass
                             
-                            refresh_success = await loop.run_in_executor(None, global_session_manager.refresh_site, site_key)
-                            if refresh_success:
-                                site = global_session_manager.get_site(site_key)
-                                logger.info(f"✅ [{phone}] Session refreshed! Continuing status checks...")
-                                # Reset last_code to force logging the next status
-                                last_code = None
-                                await asyncio.sleep(2)  # Wait a bit before next check
-                                continue
-                            else:
-                                logger.error(f"❌ [{phone}] Failed to refresh session!")
-                                # Continue checking anyway, maybe it will work
-                        
-                        # Log all status code changes for debugging
-                        if status:
-                            current_code = status.get('code')
-                            if current_code != last_code and current_code is not None:
-                                logger.info(f"📊 [{phone}] Status changed: code={current_code}, msg={status.get('msg', 'N/A')}, success={status.get('success')}, waiting={status.get('waiting')}")
-                                last_code = current_code
-                            elif check == 0:
-                                # Log initial status
-                                logger.info(f"🔍 [{phone}] Initial status: code={current_code}, msg={status.get('msg', 'N/A')}")
-                        
-                        # Update every 10 seconds
-                        if check % 10 == 0 and check > 0:
+                            # Update every 10 seconds
                             try:
                                 await processing_msg.edit_text(
                                     f"🔄 Processing {phone}\n\n"
                                     f"Progress: {completed_count}/{total_sites}\n"
                                     f"{site_info['icon']} Site {site_idx}\n"
-                                    f"⏳ Waiting... ({check}s/{max_wait_time}s)\n"
-                                    f"Status: {status.get('msg', 'Checking...') if status else 'Checking...'}",
+                                    f"⏳ Waiting... ({waited}s/{max_wait_time}s)\n"
+                                    f"Status: {(status.msg or 'Checking...') if status else 'Checking...'}",
                                     parse_mode=ParseMode.HTML
                                 )
                             except:
                                 pass  # Ignore edit errors
-                    
-                    except Exception as e:
-                        logger.error(f"[{phone}] Status check error at site {site_info['name']}: {e}")
-                        # Continue checking, maybe next attempt will work
-                    
-                    await asyncio.sleep(1)  # Check every 1 second (instant!)
+                finally:
+                    poller.cancel(phone, confirmation)
+                
+                confirmed = not confirmation.cancelled() and confirmation.result() is not None
                 
                 if confirmed:
-                    # Save progress to database
-                    await loop.run_in_executor(None, update_site_progress, phone, site_idx, True)
-                    logger.info(f"[{phone}] Site {site_idx} ({site_info['name']}) successfully linked and saved")
+                    # Save progress to database (returns the new state)
+                    progress = await db_async.update_site_progress(phone, site_idx, True) or progress
+                    logger.info("[%s] Site %s (%s) successfully linked and saved", phone, site_idx, site_info['name'], extra=log_extra)
                     
                     # Calculate new progress
-                    current_completed = completed_count + 1
+                    current_completed = progress.linked_count
                     
                     await update.message.reply_text(
                         f"✅ {site_info['icon']} Site {site_idx} linked successfully!\n\n"
@@ -1493,16 +2165,10 @@ async def process_phone_number_task(update: Update, context: ContextTypes.DEFAUL
                     # Immediately move to next site (no delay!)
                 else:
                     # Timeout - stop processing and ask user to try again
-                    logger.warning(f"[{phone}] Timeout at site {site_idx} ({site_info['name']}) after {max_wait_time}s")
+                    logger.warning("[%s] Timeout at site %s (%s) after %ss", phone, site_idx, site_info['name'], max_wait_time, extra=log_extra)
                     
-                    # Get current completed count
-                    progress = await loop.run_in_executor(None, get_number_progress, phone)
-                    current_completed = sum([
-                        progress['site1_linked'],
-                        progress['site2_linked'],
-                        progress['site3_linked'],
-                        progress['site4_linked']
-                    ]) if progress else 0
+                    # Current completed count (last saved state)
+                    current_completed = progress.linked_count
                     
                     await update.message.reply_text(
                         f"⏰ {site_info['icon']} Site {site_idx} - Timeout after {max_wait_time}s\n\n"
@@ -1515,16 +2181,10 @@ async def process_phone_number_task(update: Update, context: ContextTypes.DEFAUL
                     break
             else:
                 # Failed to get OTP - stop processing
-                logger.error(f"[{phone}] Failed to get OTP from site {site_idx} ({site_info['name']}) after {max_attempts} attempts")
+                logger.error("[%s] Failed to get OTP from site %s (%s) after %s attempts", phone, site_idx, site_info['name'], max_attempts, extra=log_extra)
                 
-                # Get current completed count
-                progress = await loop.run_in_executor(None, get_number_progress, phone)
-                current_completed = sum([
-                    progress['site1_linked'],
-                    progress['site2_linked'],
-                    progress['site3_linked'],
-                    progress['site4_linked']
-                ]) if progress else 0
+                # Current completed count (last saved state)
+                current_completed = progress.linked_count
                 
                 await update.message.reply_text(
                     f"❌ {site_info['icon']} Site {site_idx} - Failed to get OTP\n\n"
@@ -1537,18 +2197,14 @@ async def process_phone_number_task(update: Update, context: ContextTypes.DEFAUL
                 # Stop processing remaining sites
                 break
         
-        # Check if all 4 sites are now completed
-        is_completed = await loop.run_in_executor(None, check_and_complete_number, phone)
+        # All sites linked? Mark complete and add earnings in one transaction
+        user_data = await db_async.complete_number_and_credit(phone, user_id, PAYMENT_PER_NUMBER)
         
-        if is_completed:
-            # All 4 sites successful - add earnings and mark as complete
-            await loop.run_in_executor(None, update_user_stats, user_id, 1, PAYMENT_PER_NUMBER)
-            user_data = await loop.run_in_executor(None, get_user, user_id)
-            
+        if user_data:
             await processing_msg.edit_text(
                 f"🎉 <b>SUCCESS!</b>\n\n"
                 f"Number: {phone}\n"
-                f"✅ All 4 sites linked!\n\n"
+                f"✅ All {total_sites} sites linked!\n\n"
                 f"💰 Earned: ৳{PAYMENT_PER_NUMBER:.2f}\n"
                 f"💰 New balance: ৳{user_data['balance']:.2f}\n\n"
                 f"📊 Today: {user_data['daily_numbers']} numbers added\n"
@@ -1556,29 +2212,22 @@ async def process_phone_number_task(update: Update, context: ContextTypes.DEFAUL
                 parse_mode=ParseMode.HTML
             )
             
-            await loop.run_in_executor(None, log_activity, user_id, 'number_added', f"Phone: {phone}, Earnings: {PAYMENT_PER_NUMBER}")
+            await db_async.log_activity(user_id, 'number_added', f"Phone: {phone}, Earnings: {PAYMENT_PER_NUMBER}")
         else:
-            # Get current progress
-            progress = await loop.run_in_executor(None, get_number_progress, phone)
-            if progress:
-                completed_sites = sum([
-                    progress['site1_linked'],
-                    progress['site2_linked'],
-                    progress['site3_linked'],
-                    progress['site4_linked']
-                ])
-                
-                await processing_msg.edit_text(
-                    f"⏸️ <b>Progress Saved</b>\n\n"
-                    f"Number: {phone}\n"
-                    f"✅ Completed: {completed_sites}/4 sites\n"
-                    f"⏳ Remaining: {4 - completed_sites} sites\n\n"
-                    f"💡 Send the same number again to continue!",
-                    parse_mode=ParseMode.HTML
-                )
+            # Current progress (last saved state)
+            completed_sites = progress.linked_count
+            
+            await processing_msg.edit_text(
+                f"⏸️ <b>Progress Saved</b>\n\n"
+                f"Number: {phone}\n"
+                f"✅ Completed: {completed_sites}/{total_sites} sites\n"
+                f"⏳ Remaining: {total_sites - completed_sites} sites\n\n"
+                f"💡 Send the same number again to continue!",
+                parse_mode=ParseMode.HTML
+            )
     
     except Exception as e:
-        logger.error(f"[{phone}] Error processing: {e}", exc_info=True)
+        logger.error("[%s] Error processing: %s", phone, e, exc_info=True, extra={'phone': phone})
         try:
             await update.message.reply_text(
                 f"❌ Error processing {phone}\n\n"
@@ -1596,7 +2245,7 @@ async def process_phone_number_task(update: Update, context: ContextTypes.DEFAUL
                 if not active_tasks[user_id]:
                     del active_tasks[user_id]
         
-        logger.info(f"[{phone}] Task completed for user {user_id}")
+        logger.info("[%s] Task completed for user %s", phone, user_id, extra={'phone': phone})
 
 
 async def process_phone_number(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -1605,8 +2254,7 @@ async def process_phone_number(update: Update, context: ContextTypes.DEFAULT_TYP
     phone = update.message.text.strip()
     
     # Check if user is approved
-    loop = asyncio.get_event_loop()
-    user_data = await loop.run_in_executor(None, get_user, user_id)
+    user_data = await db_async.get_user(user_id)
     if not user_data or user_data['approved'] != 1:
         await update.message.reply_text(
             "❌ Access denied\n\n"
@@ -1694,7 +2342,7 @@ async def process_phone_number(update: Update, context: ContextTypes.DEFAULT_TYP
     with tasks_lock:
         active_tasks[user_id][phone] = task
     
-    logger.info(f"Started background task for user {user_id}, phone {phone}")
+    logger.info("Started background task for user %s, phone %s", user_id, phone, extra={'phone': phone})
 
 # ==================== SCHEDULED TASKS ====================
 
@@ -1705,7 +2353,7 @@ def daily_reset_task():
 
 async def send_daily_report_async(application):
     """Async helper to send daily report"""
-    report_data = get_daily_report()
+    report_data = await db_async.get_daily_report()
     
     if not report_data:
         logger.info("No report data - skipping daily report")
@@ -1741,12 +2389,12 @@ async def send_daily_report_async(application):
         )
         logger.info("Daily report sent to admin successfully")
     except Exception as e:
-        logger.error(f"Failed to send daily report: {e}")
+        logger.error("Failed to send daily report: %s", e)
 
 async def claim_hourly_rewards_async(application):
     """Claim hourly reset rewards from all sites"""
     try:
-        results = global_session_manager.claim_all_reset_rewards()
+        results = await global_session_manager.claim_all_reset_rewards()
         
         # Count successes
         success_count = sum(1 for r in results.values() if r['success'])
@@ -1760,27 +2408,25 @@ async def claim_hourly_rewards_async(application):
         message += f"🕐 Time: {time_str}\n\n"
         
         # Show results for each site
-        for site_name, result in results.items():
-            site_config = SITES.get(site_name, {})
+        for site_key, result in results.items():
+            site_config = SITES.get(site_key, {})
             site_icon = site_config.get('icon', '🔘')
-            site_display = site_config.get('name', site_name)
+            site_display = site_config.get('name', site_key)
             
             if result['success']:
-                message += f"{site_icon} <b>{site_display}</b>: ✅ Claimed\n"
-                if result.get('message'):
-                    message += f"   └─ {result['message']}\n"
+                message += f"{site_icon} <b>{site_display}</b>: ✅ Claimed ({result['latency_ms']:.0f} ms)\n"
             else:
-                message += f"{site_icon} <b>{site_display}</b>: ⏳ Not Ready\n"
-                if result.get('message'):
-                    message += f"   └─ {result['message']}\n"
+                message += f"{site_icon} <b>{site_display}</b>: ⏳ Not Ready ({result['latency_ms']:.0f} ms)\n"
+            if result.get('msg'):
+                message += f"   └─ {html.escape(str(result['msg']))}\n"
         
         message += f"\n📊 <b>Summary:</b> {success_count}/{len(results)} rewards claimed"
         
         # Log the result
         if success_count > 0:
-            logger.info(f"Hourly Claim: {success_count}/{len(results)} rewards claimed successfully")
+            logger.info("Hourly Claim: %s/%s rewards claimed successfully", success_count, len(results))
         else:
-            logger.info(f"Hourly Claim: No rewards ready yet")
+            logger.info("Hourly Claim: No rewards ready yet")
         
         # Send notification to admin
         try:
@@ -1791,10 +2437,10 @@ async def claim_hourly_rewards_async(application):
             )
             logger.info("Hourly claim notification sent to admin")
         except Exception as notify_error:
-            logger.error(f"Failed to send hourly claim notification: {notify_error}")
+            logger.error("Failed to send hourly claim notification: %s", notify_error)
             
     except Exception as e:
-        logger.error(f"Hourly claim error: {e}")
+        logger.error("Hourly claim error: %s", e)
         
         # Send error notification to admin
         try:
@@ -1815,7 +2461,7 @@ def hourly_claim_task(application, loop):
         asyncio.run_coroutine_threadsafe(claim_hourly_rewards_async(application), loop)
         logger.info("Hourly claim task scheduled")
     except Exception as e:
-        logger.error(f"Failed to schedule hourly claim: {e}")
+        logger.error("Failed to schedule hourly claim: %s", e)
 
 def daily_report_task(application, loop):
     """Daily report at 3:00 PM - called from scheduler thread"""
@@ -1826,7 +2472,7 @@ def daily_report_task(application, loop):
         asyncio.run_coroutine_threadsafe(send_daily_report_async(application), loop)
         logger.info("Daily report task scheduled")
     except Exception as e:
-        logger.error(f"Failed to schedule daily report: {e}")
+        logger.error("Failed to schedule daily report: %s", e)
 
 def schedule_tasks(application, event_loop):
     """Schedule daily tasks and hourly claims with Bangladesh timezone awareness"""
@@ -1862,12 +2508,12 @@ def schedule_tasks(application, event_loop):
                 # Hourly claim at :30 minute mark
                 hour_minute_key = f"{current_hour}:{current_minute}"
                 if current_minute == 30 and last_hourly_check != hour_minute_key:
-                    logger.info(f"Running hourly claim task at {bd_now.strftime('%I:%M %p')}...")
+                    logger.info("Running hourly claim task at %s...", bd_now.strftime('%I:%M %p'))
                     hourly_claim_task(application, event_loop)
                     last_hourly_check = hour_minute_key
                 
             except Exception as e:
-                logger.error(f"Scheduler error: {e}")
+                logger.error("Scheduler error: %s", e)
             
             time.sleep(60)  # Check every minute
     
@@ -1876,9 +2522,9 @@ def schedule_tasks(application, event_loop):
     
     # Log current time
     bd_now = datetime.now(BANGLADESH_TZ)
-    logger.info(f"Scheduler started - Current BD time: {bd_now.strftime('%I:%M %p, %B %d, %Y')}")
-    logger.info(f"Daily report: 3:00 PM BD Time | Daily reset: 8:00 AM BD Time")
-    logger.info(f"Hourly rewards: Every hour at :30 minute mark (24 times/day)")
+    logger.info("Scheduler started - Current BD time: %s", bd_now.strftime('%I:%M %p, %B %d, %Y'))
+    logger.info("Daily report: 3:00 PM BD Time | Daily reset: 8:00 AM BD Time")
+    logger.info("Hourly rewards: Every hour at :30 minute mark (24 times/day)")
 
 # ==================== MAIN ====================
 
@@ -1888,6 +2534,17 @@ async def post_init(application):
     loop = asyncio.get_running_loop()
     schedule_tasks(application, loop)
 
+async def post_shutdown(application):
+    """Post shutdown - release shared HTTP and DB connections"""
+    global_session_manager.stop_renewal()
+    await run_db(activity_log_buffer.close)
+    await run_db(close_pool)
+    await db_async.close_pool()
+    if aiohttp is not None:
+        await close_async_http_session()
+    for executor in [db_executor, *site_executors.values()]:
+        executor.shutdown(wait=False)
+
 def start_health_server(port=10000):
     """Start a simple HTTP server for Render health checks"""
     from http.server import HTTPServer, BaseHTTPRequestHandler
@@ -1908,7 +2565,7 @@ def start_health_server(port=10000):
     
     server_thread = threading.Thread(target=run_server, daemon=True)
     server_thread.start()
-    logger.info(f"Health check server started on port {port}")
+    logger.info("Health check server started on port %s", port)
 
 def main():
     """Start the bot"""
@@ -1935,20 +2592,21 @@ def main():
     # Initialize global sessions at startup
     print("\n[*] Logging in to all sites...")
     if global_session_manager.initialize_all():
-        print("[OK] All sites logged in successfully")
-        print("[OK] Sessions ready for all users")
-        print("[OK] 100+ users can work simultaneously\n")
+        print(f"[OK] {len(global_session_manager.sites)}/{len(SITES)} sites logged in")
+        if len(global_session_manager.sites) < len(SITES):
+            print("[*] Remaining sites keep logging in in the background")
+        print("[OK] Sessions ready for all users\n")
     else:
-        print("[!] Some sites failed to login")
-        print("Bot will continue, sessions will retry on demand\n")
+        print("[!] No site logged in yet")
+        print("Bot will continue, sessions keep retrying in the background\n")
     
-    # Create application with larger thread pool for 100+ concurrent users
-    from concurrent.futures import ThreadPoolExecutor
+    # Create application (blocking work runs on the site/DB thread pools)
     application = (
         Application.builder()
         .token(BOT_TOKEN)
         .concurrent_updates(True)  # Enable concurrent update processing
         .post_init(post_init)  # Initialize scheduler after bot starts
+        .post_shutdown(post_shutdown)  # Close shared HTTP pool
         .build()
     )
     